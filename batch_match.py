@@ -0,0 +1,132 @@
+import argparse
+import contextlib
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from helper.matching_engine import MatchingEngine
+from helper.model_store import DB_PATH, JSON_PATH, ModelStore
+
+CSV_FIELDS = ['image', 'model', 'count', 'index', 'x1', 'y1', 'x2', 'y2', 'score', 'cx', 'cy',
+              'elapsed_ms', 'error']
+
+# Set in every worker by init_worker
+_worker_settings = {}
+
+
+def collect_images(patterns):
+    """ Expands directories and glob patterns into a sorted, de-duplicated list of image files. """
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*")
+        paths.extend(path for path in glob.glob(pattern)
+                     if os.path.isfile(path) and path.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp')))
+    return sorted(set(paths))
+
+
+def init_worker(model, threshold, overlap_thresh):
+    # One OpenCV thread per process, the pool already spreads the work over the cores
+    cv2.setNumThreads(1)
+    _worker_settings.update(engine=MatchingEngine(), model=model, threshold=threshold,
+                            overlap_thresh=overlap_thresh)
+
+
+def match_image(image_path):
+    start = time.perf_counter()
+    try:
+        match = _worker_settings['engine'].match_frame(
+            _worker_settings['model'], image_path,
+            threshold=_worker_settings['threshold'], overlap_thresh=_worker_settings['overlap_thresh'])
+        result = dict(match.to_dict(), error=None)
+    except Exception as e:
+        result = {'model': _worker_settings['model']['name'], 'count': 0, 'boxes': [], 'scores': [],
+                  'centers': [], 'count_10_percent': 0, 'error': str(e),
+                  'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)}
+    return dict(result, image=image_path)
+
+
+def csv_rows(result):
+    base = {'image': result['image'], 'model': result['model'], 'count': result['count'],
+            'elapsed_ms': result['elapsed_ms'], 'error': result['error'] or ''}
+    if not result['boxes']:
+        yield base
+    for i, (box, score, center) in enumerate(zip(result['boxes'], result['scores'], result['centers'])):
+        row = dict(base, index=i + 1, score=score, cx=center[0], cy=center[1])
+        row.update(zip(('x1', 'y1', 'x2', 'y2'), box))
+        yield row
+
+
+def run_batch(model, image_paths, output, output_format="jsonl", workers=None, threshold=0.8,
+              overlap_thresh=0.3):
+    """ Matches every image against the model in a process pool and streams one record per image. """
+    writer = None
+    if output_format == "csv":
+        writer = csv.DictWriter(output, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+
+    failed = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(model, threshold, overlap_thresh)) as executor:
+        # map yields in input order as soon as each result is ready
+        for result in executor.map(match_image, image_paths):
+            if result['error']:
+                failed += 1
+            if writer:
+                writer.writerows(csv_rows(result))
+            else:
+                output.write(json.dumps(result) + "\n")
+            output.flush()
+
+    elapsed = time.perf_counter() - start
+    rate = len(image_paths) / elapsed if elapsed > 0 else 0.0
+    print(f"Matched {len(image_paths)} images in {elapsed:.2f}s ({rate:.2f} images/s), {failed} failed",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Match a saved model against a directory of images.")
+    parser.add_argument("model", help="model name from the model store")
+    parser.add_argument("images", nargs="+", help="image files, directories or glob patterns")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="output format")
+    parser.add_argument("--output", help="write results to this file instead of stdout")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--threshold", type=float, default=0.8, help="minimum SSIM score (0-1)")
+    parser.add_argument("--overlap", type=float, default=0.3, help="non-max suppression overlap")
+    parser.add_argument("--models-db", default=DB_PATH, help="path to the model store database")
+    parser.add_argument("--model-info", default=JSON_PATH,
+                        help="model_info.json merged into the database whenever it changes")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Loading the model also fills the on-disk reference cache, so the workers only read it.
+    # Store and cache notices go to stderr so stdout carries nothing but the records.
+    with contextlib.redirect_stdout(sys.stderr):
+        model = MatchingEngine(ModelStore(args.models_db, args.model_info)).load_model(args.model)
+    if model is None:
+        return 2
+
+    image_paths = collect_images(args.images)
+    if not image_paths:
+        print("No images found.", file=sys.stderr)
+        return 2
+
+    if args.output:
+        with open(args.output, "w", newline="") as output:
+            return run_batch(model, image_paths, output, args.format, args.workers, args.threshold, args.overlap)
+    return run_batch(model, image_paths, sys.stdout, args.format, args.workers, args.threshold, args.overlap)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # POSIX only; Windows reports no peak RSS
+    resource = None
+
+from helper.model_store import model_store
+from helper.object_matching import extract_objects, find_and_match_object, load_binary_image, non_max_suppression
+from helper.template_matching import calculate_match_percentage
+
+# Inspection frames of the bundled corpus; model crops are taken from the model store
+DEFAULT_FRAME_PATTERNS = ["images/*_CAM.png", "images/C*_*.png"]
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def convert_to_binary_case(model, frame_path):
+    # The decode + threshold of convert_to_binary; its debug PNG dump is not part of any hot path
+    return lambda: load_binary_image(frame_path)
+
+
+def extract_objects_case(model, frame_path):
+    binary = load_binary_image(frame_path)
+    return lambda: extract_objects(binary)
+
+
+def find_and_match_object_case(model, frame_path):
+    binary = load_binary_image(frame_path)
+    return lambda: find_and_match_object(model['image_path'], binary)
+
+
+def non_max_suppression_case(model, frame_path):
+    # Every contour of the frame as a candidate, the worst case the matcher could hand to NMS
+    objects = extract_objects(load_binary_image(frame_path))
+    boxes = np.array([(x, y, x + w, y + h) for _, (x, y, w, h), _, _ in objects])
+    scores = [w * h for _, (_, _, w, h), _, _ in objects]
+    return lambda: non_max_suppression(boxes, 0.3, scores=scores)
+
+
+def calculate_match_percentage_case(model, frame_path):
+    primary_img = Image.open(model['image_path'])
+    primary_img.load()
+    additional_img = Image.open(frame_path)
+    additional_img.load()
+    return lambda: calculate_match_percentage(primary_img, additional_img, model)
+
+
+# name -> (case builder, runs once per model rather than once per frame)
+STAGES = {
+    'convert_to_binary': (convert_to_binary_case, False),
+    'extract_objects': (extract_objects_case, False),
+    'find_and_match_object': (find_and_match_object_case, True),
+    'non_max_suppression': (non_max_suppression_case, False),
+    'calculate_match_percentage': (calculate_match_percentage_case, True),
+}
+
+
+def collect_frames(patterns, model_images):
+    paths = set()
+    for pattern in patterns:
+        paths.update(path for path in glob.glob(pattern) if os.path.isfile(path))
+    model_images = {os.path.normpath(path) for path in model_images}
+    return sorted(path for path in paths if os.path.normpath(path) not in model_images)
+
+
+def frames_for_model(model, frames):
+    """ The model's own captures (named after it) plus the camera frames; all frames if it has none. """
+    own = [path for path in frames
+           if os.path.basename(path).startswith(f"{model['name']}_") or path.endswith("_CAM.png")]
+    return own or frames
+
+
+def stage_cases(stage, models, frames):
+    build, per_model = STAGES[stage]
+    if per_model:
+        return [(build, model, frame) for model in models for frame in frames_for_model(model, frames)]
+    return [(build, models[0] if models else None, frame) for frame in frames]
+
+
+def summarize(samples_ms, peak_bytes):
+    samples = np.asarray(samples_ms)
+    total_s = samples.sum() / 1000
+    summary = {
+        'runs': int(len(samples)),
+        'mean_ms': round(float(samples.mean()), 3),
+        'min_ms': round(float(samples.min()), 3),
+        'max_ms': round(float(samples.max()), 3),
+        'throughput_per_s': round(len(samples) / total_s, 2) if total_s > 0 else None,
+        'peak_traced_mb': round(peak_bytes / 2 ** 20, 2),
+    }
+    for q, value in zip(PERCENTILES, np.percentile(samples, PERCENTILES)):
+        summary[f'p{q}_ms'] = round(float(value), 3)
+    return summary
+
+
+def run_stage(cases, repeat, warmup):
+    """ Times every case repeat times, then runs each once more under tracemalloc for the peak. """
+    samples = []
+    peak = 0
+    skipped = 0
+    for build, model, frame in cases:
+        try:
+            call = build(model, frame)
+            for _ in range(max(1, warmup)):
+                call()  # Fills the reference and template caches, as on a running station
+        except Exception as e:
+            # e.g. a frame smaller than the model crop; timing a failure would skew the stage
+            print(f"Skipping {frame}: {type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}",
+                  file=sys.stderr)
+            skipped += 1
+            continue
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            samples.append((time.perf_counter() - start) * 1000)
+
+        # Memory is measured separately so tracing does not slow down the timed runs
+        tracemalloc.start()
+        try:
+            call()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    if not samples:
+        return None
+    return dict(summarize(samples, peak), skipped=skipped)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def max_rss_mb():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux and the other POSIX systems kilobytes
+    return round(usage / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def run_benchmark(models, frames, stages, repeat=3, warmup=1):
+    results = {}
+    for stage in stages:
+        cases = stage_cases(stage, models, frames)
+        print(f"{stage}: {len(cases)} cases x {repeat}", file=sys.stderr)
+        results[stage] = run_stage(cases, repeat, warmup)
+
+    return {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'revision': git_revision(),
+        'environment': {
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'opencv_threads': cv2.getNumThreads(),
+        },
+        'settings': {'repeat': repeat, 'warmup': warmup},
+        'corpus': {'models': [model['name'] for model in models], 'frames': frames},
+        'stages': results,
+        'max_rss_mb': max_rss_mb(),
+    }
+
+
+def print_report(report, baseline=None, output=sys.stdout):
+    columns = ['runs', 'p50_ms', 'p90_ms', 'p95_ms', 'p99_ms', 'throughput_per_s', 'peak_traced_mb']
+    output.write(f"{'stage':<28}" + "".join(f"{column:>17}" for column in columns) + "\n")
+    for stage, summary in report['stages'].items():
+        if summary is None:
+            output.write(f"{stage:<28}  no cases\n")
+            continue
+        output.write(f"{stage:<28}" + "".join(f"{summary[column]:>17}" for column in columns) + "\n")
+        before = (baseline or {}).get('stages', {}).get(stage)
+        if before:
+            deltas = []
+            for column in columns[1:]:
+                if before.get(column):
+                    deltas.append(f"{(summary[column] - before[column]) / before[column] * 100:+16.1f}%")
+                else:
+                    deltas.append(f"{'-':>17}")
+            output.write(f"{'  vs ' + str(baseline.get('revision') or 'baseline'):<28}{'':>17}"
+                         + "".join(deltas) + "\n")
+    if report.get('max_rss_mb') is not None:
+        output.write(f"max RSS: {report['max_rss_mb']} MB\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time every matching stage over the bundled image corpus.")
+    parser.add_argument("--models", nargs="+", help="model names (default: every model in the store)")
+    parser.add_argument("--frames", nargs="+", default=DEFAULT_FRAME_PATTERNS, help="frame glob patterns")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES), help="stages to run")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per case before timing (at least one)")
+    parser.add_argument("--limit", type=int, help="use at most this many frames")
+    parser.add_argument("--output", help="write the JSON results here (default: benchmarks/<time>.json)")
+    parser.add_argument("--compare", help="earlier JSON results to print the change against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    models = model_store.all()
+    if args.models:
+        models = [model for model in models if model['name'] in args.models]
+    models = [model for model in models if os.path.isfile(model.get('image_path', ''))]
+    frames = collect_frames(args.frames, [model['image_path'] for model in model_store.all()])
+    if args.limit:
+        frames = frames[:args.limit]
+    if not models or not frames:
+        print("Nothing to benchmark: no models with an image or no frames found.", file=sys.stderr)
+        return 2
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    report = run_benchmark(models, frames, args.stages, args.repeat, args.warmup)
+
+    output_path = args.output or os.path.join("benchmarks", time.strftime("%Y%m%d_%H%M%S.json"))
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump(report, output_file, indent=4)
+
+    print_report(report, baseline)
+    print(f"Results saved to {output_path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import queue
+import threading
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class BackgroundJob:
+    def __init__(self, job_id, events, func, args, kwargs, on_done, on_error, on_progress):
+        self.job_id = job_id
+        self.events = events
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def progress(self, stage):
+        """ Passed to the job function; reports a stage and aborts the job once it has been superseded. """
+        if self.cancelled.is_set():
+            raise JobCancelled()
+        self.events.put(('progress', self, stage))
+
+
+class BackgroundExecutor:
+    """
+    Runs jobs on one background thread so the Tk mainloop keeps running: matching, and also
+    loading that only the newest request cares about (model icons, visible thumbnails).
+    Submitting a job cancels the one in flight and replaces any job still waiting, so only
+    the newest request is ever worked on. Results and progress are handed back on the Tk
+    thread by polling a queue with root.after; Tk is never touched from the worker.
+    """
+
+    def __init__(self, root, name="match-executor", poll_interval=50):
+        self.name = name
+        self.root = root
+        self.poll_interval = poll_interval
+        self.events = queue.Queue()
+        self.condition = threading.Condition()
+        self.pending = None
+        self.current = None
+        self.latest_id = 0
+        self.poll_id = None
+        self.running = True
+
+        self.worker = threading.Thread(target=self.run, name=name, daemon=True)
+        self.worker.start()
+
+    def submit(self, func, *args, on_done=None, on_error=None, on_progress=None, **kwargs):
+        """ Runs func(*args, progress=job.progress, **kwargs) in the background and returns the job. """
+        with self.condition:
+            self.latest_id += 1
+            job = BackgroundJob(self.latest_id, self.events, func, args, kwargs, on_done, on_error, on_progress)
+            if self.current:
+                self.current.cancel()
+            self.pending = job
+            self.condition.notify()
+        self.schedule_poll()
+        return job
+
+    def cancel_all(self):
+        with self.condition:
+            self.latest_id += 1
+            if self.current:
+                self.current.cancel()
+            self.pending = None
+
+    def shutdown(self):
+        with self.condition:
+            self.running = False
+            if self.current:
+                self.current.cancel()
+            self.pending = None
+            self.condition.notify()
+        if self.poll_id:
+            try:
+                self.root.after_cancel(self.poll_id)
+            except Exception:
+                pass  # Root already destroyed
+            self.poll_id = None
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and self.pending is None:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                job, self.pending = self.pending, None
+                self.current = job
+
+            try:
+                result = job.func(*job.args, progress=job.progress, **job.kwargs)
+                self.events.put(('done', job, result))
+            except JobCancelled:
+                pass
+            except Exception as e:
+                self.events.put(('error', job, e))
+            finally:
+                with self.condition:
+                    self.current = None
+
+    def is_busy(self):
+        with self.condition:
+            return self.pending is not None or self.current is not None
+
+    def schedule_poll(self):
+        if self.poll_id is None and self.running:
+            self.poll_id = self.root.after(self.poll_interval, self.poll)
+
+    def poll(self):
+        self.poll_id = None
+        while True:
+            try:
+                kind, job, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
+            # Anything from a superseded job is stale
+            if job.job_id != self.latest_id:
+                continue
+            if kind == 'progress' and job.on_progress:
+                job.on_progress(payload)
+            elif kind == 'done' and job.on_done:
+                job.on_done(payload)
+            elif kind == 'error':
+                if job.on_error:
+                    job.on_error(payload)
+                else:
+                    print(f"{self.name} job {job.job_id} failed: {payload}")
+
+        if self.is_busy() or not self.events.empty():
+            self.schedule_poll()
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import deque
+
+# Applied once when a device is opened; None keeps the driver default
+DEFAULT_CAMERA_SETTINGS = {
+    'width': None,
+    'height': None,
+    'fps': None,
+}
+
+# Frames thrown away after opening while auto exposure settles
+WARMUP_FRAMES = 5
+
+
+class Frame:
+    """ One grabbed frame. timestamp is time.monotonic() right after the read returned. """
+
+    def __init__(self, image, index, timestamp, wall_time):
+        self.image = image
+        self.index = index
+        self.timestamp = timestamp
+        self.wall_time = wall_time
+
+    def age(self):
+        return time.monotonic() - self.timestamp
+
+
+class FrameGrabber:
+    """
+    Reads a camera on its own thread as fast as the device delivers frames and keeps only the
+    newest buffer_size of them, so consumers never see a frame that has queued up behind others.
+    Frames that were overwritten before anyone took them are counted as dropped.
+    """
+
+    def __init__(self, source=0, buffer_size=1, settings=None):
+        self.source = source
+        self.settings = dict(DEFAULT_CAMERA_SETTINGS)
+        self.settings.update(settings or {})
+        self.frames = deque(maxlen=buffer_size)
+        self.condition = threading.Condition()
+        self.capture = None
+        self.thread = None
+        self.running = False
+        self.frame_count = 0
+        self.dropped_count = 0
+        self.last_taken_index = -1
+
+    def start(self):
+        """ Opens the device and starts grabbing; returns False if the camera could not be opened. """
+        if self.running:
+            return True
+
+        import cv2
+        self.capture = cv2.VideoCapture(self.source)
+        if not self.capture.isOpened():
+            print(f"Could not open camera {self.source}")
+            self.capture = None
+            return False
+        # Ask the driver not to queue frames either; ignored by backends that do not support it
+        self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        for name, prop in (('width', cv2.CAP_PROP_FRAME_WIDTH), ('height', cv2.CAP_PROP_FRAME_HEIGHT),
+                           ('fps', cv2.CAP_PROP_FPS)):
+            if self.settings[name] is not None:
+                self.capture.set(prop, self.settings[name])
+
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name=f"frame-grabber-{self.source}", daemon=True)
+        self.thread.start()
+        return True
+
+    def run(self):
+        while self.running:
+            ret, image = self.capture.read()
+            if not ret:
+                # Device hiccup or unplugged; back off instead of spinning
+                time.sleep(0.01)
+                continue
+
+            frame = Frame(image, self.frame_count, time.monotonic(), time.time())
+            with self.condition:
+                if len(self.frames) == self.frames.maxlen and self.frames[0].index > self.last_taken_index:
+                    self.dropped_count += 1
+                self.frames.append(frame)
+                self.frame_count += 1
+                self.condition.notify_all()
+
+    def latest(self, after_index=-1):
+        """ Newest frame, or None when there is none newer than after_index. Never blocks on the camera. """
+        with self.condition:
+            if not self.frames or self.frames[-1].index <= after_index:
+                return None
+            frame = self.frames[-1]
+            self.last_taken_index = max(self.last_taken_index, frame.index)
+            return frame
+
+    def recent(self):
+        """ Buffered frames, oldest first; used to pair frames across cameras. """
+        with self.condition:
+            return list(self.frames)
+
+    def resize_buffer(self, buffer_size):
+        with self.condition:
+            if buffer_size != self.frames.maxlen:
+                self.frames = deque(self.frames, maxlen=buffer_size)
+
+    def wait_for_frame(self, after_index=-1, timeout=1.0):
+        """ Blocks until a frame newer than after_index arrives (or timeout) and returns the newest. """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.running and (not self.frames or self.frames[-1].index <= after_index):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+        return self.latest(after_index)
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+        self.thread = None
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+        self.frames.clear()
+
+
+class CameraManager:
+    """
+    Opens each camera once and keeps its FrameGrabber running, so snapshots and video share a
+    warm device instead of paying the open and auto exposure cost on every click.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings or {}
+        self.grabbers = {}
+        self.lock = threading.Lock()
+
+    def get(self, source=0, buffer_size=1):
+        """ Running grabber for the source, opened on first use; None if the device cannot be opened. """
+        with self.lock:
+            grabber = self.grabbers.get(source)
+            if grabber and grabber.running:
+                # Keep the larger buffer when another user (e.g. frame pairing) asked for one
+                grabber.resize_buffer(max(buffer_size, grabber.frames.maxlen))
+                return grabber
+            grabber = FrameGrabber(source, buffer_size, settings=self.settings.get(source))
+            if not grabber.start():
+                return None
+            self.grabbers[source] = grabber
+            return grabber
+
+    def snapshot(self, source=0, timeout=2.0):
+        """ First frame grabbed after the call (past the warm up frames), or None. """
+        grabber = self.get(source)
+        if grabber is None:
+            return None
+        newest = grabber.latest()
+        after_index = max(newest.index if newest else -1, WARMUP_FRAMES - 1)
+        return grabber.wait_for_frame(after_index, timeout)
+
+    def release(self, source):
+        with self.lock:
+            grabber = self.grabbers.pop(source, None)
+        if grabber:
+            grabber.stop()
+
+    def release_all(self):
+        with self.lock:
+            grabbers, self.grabbers = list(self.grabbers.values()), {}
+        for grabber in grabbers:
+            grabber.stop()
+
+
+camera_manager = CameraManager()
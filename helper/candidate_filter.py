@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+
+# Set a gate to None to switch it off
+DEFAULT_PREFILTER = {
+    'min_side': 4,  # pixels; specks smaller than this are never a part
+    # candidate box area / reference box area. This and the aspect gate are limits the matcher did not
+    # have before: a part must appear at 1/2 to 2 times the model's linear size (1/4 to 4 times its area)
+    # and within 2x of its w/h to be scored at all. find_and_match_object(prefilter=False) lifts them
+    'area_ratio': (0.25, 4.0),
+    'max_aspect_change': 2.0,  # allowed factor between candidate and reference w/h
+    'max_shape_distance': 2.0,  # cv2.matchShapes (Hu moments, CONTOURS_MATCH_I1)
+}
+
+GATES = ('size', 'area', 'aspect', 'shape')
+
+
+def prefilter_candidates(larger_objects, reference_objects, config=None):
+    """
+    Drops candidates that cannot match any reference object before they are resized and scored.
+    A candidate survives when all gates pass against at least one reference object. Returns the
+    surviving objects and how many candidates each gate removed.
+    """
+    settings = dict(DEFAULT_PREFILTER)
+    settings.update(config or {})
+    removed = {gate: 0 for gate in GATES}
+
+    references = [obj for obj in reference_objects if obj[0].size > 0]
+    if not larger_objects or not references:
+        return list(larger_objects), removed
+
+    l_sizes = np.array([(w, h) for _, (x, y, w, h), _, _ in larger_objects], dtype=np.float64)
+    r_sizes = np.array([(w, h) for _, (x, y, w, h), _, _ in references], dtype=np.float64)
+
+    # passes[g] is an (N, M) mask of candidate/reference pairs that pass the g-th geometric gate
+    passes = np.ones((3, len(larger_objects), len(references)), dtype=bool)
+
+    if settings['min_side'] is not None:
+        passes[0] = (l_sizes.min(axis=1) >= settings['min_side'])[:, np.newaxis]
+
+    if settings['area_ratio'] is not None:
+        min_ratio, max_ratio = settings['area_ratio']
+        area_ratio = np.outer(l_sizes.prod(axis=1), 1.0 / r_sizes.prod(axis=1))
+        passes[1] = (area_ratio >= min_ratio) & (area_ratio <= max_ratio)
+
+    if settings['max_aspect_change'] is not None:
+        aspect_change = np.abs(np.log(l_sizes[:, 0] / l_sizes[:, 1])[:, np.newaxis]
+                               - np.log(r_sizes[:, 0] / r_sizes[:, 1])[np.newaxis, :])
+        passes[2] = aspect_change <= np.log(settings['max_aspect_change'])
+
+    # Number of consecutive gates each pair gets through
+    reached = np.cumprod(passes, axis=0).sum(axis=0)
+
+    kept = []
+    for i, obj in enumerate(larger_objects):
+        best = int(reached[i].max())
+        if best == 3:
+            if settings['max_shape_distance'] is None:
+                kept.append(obj)
+                continue
+            # Hu moment distance is the most expensive gate, only run it on survivors
+            for j in np.flatnonzero(reached[i] == 3):
+                distance = cv2.matchShapes(obj[3], references[j][3], cv2.CONTOURS_MATCH_I1, 0)
+                if distance <= settings['max_shape_distance']:
+                    kept.append(obj)
+                    break
+            else:
+                removed['shape'] += 1
+        else:
+            removed[GATES[best]] += 1
+
+    return kept, removed
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import threading
+
+# Model buttons show their reference image at this size
+ICON_SIZE = 30
+
+
+class IconCache:
+    """
+    Small icons on disk keyed by the hash of their source image, so a start only decodes
+    pre-sized PNGs. index.json remembers each source's (mtime, size) -> hash, so unchanged sources
+    are not even read to be hashed.
+    """
+
+    def __init__(self, cache_dir="cache/icons", size=ICON_SIZE):
+        self.cache_dir = cache_dir
+        self.size = size
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.index = None  # source path -> [mtime_ns, file size, key]
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def load_index(self):
+        if self.index is None:
+            try:
+                with open(self.index_path, "r") as index_file:
+                    self.index = json.load(index_file)
+            except (OSError, ValueError):
+                self.index = {}
+        return self.index
+
+    def save_index(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f"{self.index_path}.tmp"
+                with open(tmp_path, "w") as index_file:
+                    json.dump(self.index, index_file)
+                os.replace(tmp_path, self.index_path)
+                self.dirty = False
+            except OSError as e:
+                print(f"Could not write icon index {self.index_path}: {e}")
+
+    def source_key(self, path):
+        stat = os.stat(path)
+        with self.lock:
+            known = self.load_index().get(path)
+        if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            return known[2]
+        with open(path, "rb") as image_file:
+            key = hashlib.sha1(image_file.read()).hexdigest()
+        with self.lock:
+            self.index[path] = [stat.st_mtime_ns, stat.st_size, key]
+            self.dirty = True
+        return key
+
+    def icon_path(self, path, size=None, scale=None):
+        """
+        Path of the cached PNG for an image file, resized to size x size (the icon size by default)
+        or by scale, baking it on the first call. Tk loads the result itself, so a warm start
+        needs no PIL at all. None if the source cannot be read.
+        """
+        try:
+            key = self.source_key(path)
+        except OSError as e:
+            print(f"Error loading image {path}: {e}")
+            return None
+        suffix = f"x{scale}" if scale else f"{size or self.size}"
+        icon_path = os.path.join(self.cache_dir, f"{key}_{suffix}.png")
+        if os.path.exists(icon_path):
+            return icon_path
+
+        from PIL import Image
+
+        try:
+            with Image.open(path) as image:
+                if scale:
+                    target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+                else:
+                    target = (size or self.size, size or self.size)
+                    image.draft("RGB", target)  # JPEGs decode straight at a reduced scale
+                if image.mode not in ("RGB", "RGBA", "L"):
+                    image = image.convert("RGBA")
+                icon = image.resize(target, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        except (OSError, ValueError) as e:
+            print(f"Error loading image {path}: {e}")
+            return None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{icon_path}.tmp"
+            icon.save(tmp_path, format="PNG")
+            os.replace(tmp_path, icon_path)
+        except OSError as e:
+            print(f"Could not write icon {icon_path}: {e}")
+            return None
+        return icon_path
+
+
+icon_cache = IconCache()
@@ -1,13 +1,17 @@
 import os
-from PIL import Image, ImageTk
-from io import BytesIO
+import tkinter as tk
+
+from helper.icon_cache import icon_cache
+
 
 def load_image_from_file(file_path):
+    # The 30x30 icon is baked once into the icon cache; after that Tk reads the small PNG directly
+    icon_path = icon_cache.icon_path(file_path)
+    if icon_path is None:
+        return None
     try:
-        image = Image.open(file_path)
-        image = image.resize((30, 30), Image.Resampling.LANCZOS)  # Resize the image
-        return ImageTk.PhotoImage(image)
-    except Exception as e:
+        return tk.PhotoImage(file=icon_path)
+    except tk.TclError as e:
         print(f"Failed to load image from {file_path}: {e}")
         return None
 
@@ -26,4 +30,6 @@ def load_icons():
         'test': load_image_from_file(os.path.join(icon_path, 'test-model.png')),
         'add_model': load_image_from_file(os.path.join(icon_path, 'add_model.png'))
     }
+    # Any icon baked just now is remembered for the next start
+    icon_cache.save_index()
     return icons
@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+# Cycles kept per stage for the rolling percentiles
+HISTOGRAM_WINDOW = 500
+
+# A cycle this many times slower than the rolling median is logged as a spike
+SPIKE_FACTOR = 2.0
+
+# Spikes are only judged once this many cycles have been seen
+MIN_CYCLES_FOR_SPIKES = 20
+
+logger = logging.getLogger("tok.timing")
+logger.addHandler(logging.NullHandler())
+
+
+class RollingHistogram:
+    """ The last `window` values of one measurement, for percentiles that follow the line's current state. """
+
+    def __init__(self, window=HISTOGRAM_WINDOW):
+        self.values = deque(maxlen=window)
+
+    def add(self, value):
+        self.values.append(value)
+
+    def percentile(self, q):
+        if not self.values:
+            return None
+        ordered = sorted(self.values)
+        return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+    def summary(self):
+        if not self.values:
+            return None
+        return {'count': len(self.values), 'p50': round(self.percentile(50), 2),
+                'p95': round(self.percentile(95), 2), 'max': round(max(self.values), 2)}
+
+
+class CycleTrace:
+    """ Stage timings (ms) and counters of one inspection cycle. """
+
+    def __init__(self, source):
+        self.source = source
+        self.start = time.perf_counter()
+        self.wall_time = time.time()
+        self.stages = {}
+        self.counters = {}
+        self.total_ms = None
+        self.error = None
+
+    def add_stage(self, name, ms):
+        # A stage entered twice in one cycle (e.g. one score pass per reference object) adds up
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'time': round(self.wall_time, 3),
+            'total_ms': round(self.total_ms, 2) if self.total_ms is not None else None,
+            'stages': {name: round(ms, 2) for name, ms in self.stages.items()},
+            'counters': dict(self.counters),
+            'error': self.error,
+        }
+
+
+class Instrumentation:
+    """
+    Hot-path timers for the matching cycle. A cycle is opened around one inspection (an upload,
+    a live frame) and the code below it times its stages with stage() and reports candidate
+    counts with count(); both are no-ops outside a cycle, so the matcher can be called from
+    scripts unchanged. Finished cycles go to the "tok.timing" logger as JSON and into rolling
+    histograms, and the newest one is kept for the status bar.
+    """
+
+    def __init__(self, window=HISTOGRAM_WINDOW):
+        self.window = window
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.last_cycle = None
+        self.cycles = 0
+
+    def current(self):
+        return getattr(self.local, 'trace', None)
+
+    @contextmanager
+    def cycle(self, source):
+        if self.current() is not None:
+            yield self.current()  # Nested call, e.g. match_frame inside an upload; the outer cycle owns it
+            return
+        trace = CycleTrace(source)
+        self.local.trace = trace
+        try:
+            yield trace
+        except BaseException as e:
+            trace.error = type(e).__name__  # Cancelled or failed; logged but kept out of the histograms
+            raise
+        finally:
+            self.local.trace = None
+            trace.total_ms = (time.perf_counter() - trace.start) * 1000
+            self.finish(trace)
+
+    @contextmanager
+    def stage(self, name):
+        trace = self.current()
+        if trace is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            trace.add_stage(name, (time.perf_counter() - start) * 1000)
+
+    def count(self, name, value):
+        trace = self.current()
+        if trace is not None:
+            trace.counters[name] = value
+
+    def fail(self, message):
+        """ Records why the current cycle produced no result; such cycles stay out of the histograms. """
+        trace = self.current()
+        if trace is not None:
+            trace.error = message
+        else:
+            logger.warning(json.dumps({'error': message}))
+
+    def finish(self, trace):
+        if trace.error:
+            logger.info(json.dumps(trace.to_dict()))
+            return
+        with self.lock:
+            total = self.histograms.setdefault('total', RollingHistogram(self.window))
+            typical_total = total.percentile(50)
+            typical_stages = {name: self.histograms[name].percentile(50)
+                              for name in trace.stages if name in self.histograms}
+            enough_history = len(total.values) >= MIN_CYCLES_FOR_SPIKES
+
+            total.add(trace.total_ms)
+            for name, ms in trace.stages.items():
+                self.histograms.setdefault(name, RollingHistogram(self.window)).add(ms)
+            self.last_cycle = trace
+            self.cycles += 1
+
+        record = trace.to_dict()
+        logger.info(json.dumps(record))
+        if enough_history and typical_total and trace.total_ms > SPIKE_FACTOR * typical_total:
+            # Blame the stage that grew the most over its own median
+            culprit = max(trace.stages, default=None,
+                          key=lambda name: trace.stages[name] - (typical_stages.get(name) or 0.0))
+            logger.warning(json.dumps({'spike': True, 'source': trace.source,
+                                       'total_ms': record['total_ms'], 'typical_ms': round(typical_total, 2),
+                                       'stage': culprit, 'stages': record['stages']}))
+
+    def summary(self):
+        """ Rolling p50/p95/max per stage and for the whole cycle. """
+        with self.lock:
+            return {name: histogram.summary() for name, histogram in self.histograms.items()}
+
+    def format_breakdown(self, trace=None):
+        """ '84 ms: decode 12 · binarize 3 · ...' for the last cycle, empty before the first. """
+        trace = trace or self.last_cycle
+        if trace is None or trace.total_ms is None:
+            return ""
+        stages = " · ".join(f"{name} {ms:.0f}" for name, ms in trace.stages.items())
+        return f"{trace.total_ms:.0f} ms: {stages}" if stages else f"{trace.total_ms:.0f} ms"
+
+
+def log_to_file(path="logs/timing.jsonl", max_bytes=5 * 2 ** 20, backup_count=3):
+    """ Appends every cycle record to a rotating file, one JSON object per line. """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return handler
+
+
+instrumentation = Instrumentation()
@@ -57,6 +57,19 @@ class Language:
                 'center_x': 'Center X',
                 'center_y': 'Center Y',
                 'rotation_angle': 'Rotation Angle',
+                'matching_stage': 'Matching: {stage}',
+                'matching_failed': 'Matching failed',
+                'stage_queued': 'queued',
+                'stage_decode': 'loading image',
+                'stage_extract': 'extracting objects',
+                'stage_score': 'scoring',
+                'stage_nms': 'removing overlaps',
+                'stage_draw': 'drawing results',
+                'live_result': 'Live: {count} found, {latency} ms',
+                'station_result': 'Cameras OK: {passed}/{total} (sync {spread} ms)',
+                'preview_fps': 'Preview {fps} FPS',
+                'cycle_timing': 'Cycle {breakdown}',
+                'stream_cycle_timing': 'Slowest {stream}: {breakdown}',
             },
             'jp': {
                 'home': 'ホーム',
@@ -113,6 +126,19 @@ class Language:
                 'center_x': '中心X',
                 'center_y': '中心Y',
                 'rotation_angle': '回転角度',
+                'matching_stage': 'マッチング中: {stage}',
+                'matching_failed': 'マッチング失敗',
+                'stage_queued': '待機中',
+                'stage_decode': '画像読み込み',
+                'stage_extract': 'オブジェクト抽出',
+                'stage_score': 'スコア計算',
+                'stage_nms': '重複除去',
+                'stage_draw': '結果描画',
+                'live_result': 'ライブ: {count} 個検出, {latency} ms',
+                'station_result': 'カメラOK: {passed}/{total} (同期 {spread} ms)',
+                'preview_fps': 'プレビュー {fps} FPS',
+                'cycle_timing': 'サイクル {breakdown}',
+                'stream_cycle_timing': '最遅 {stream}: {breakdown}',
 
             }
         }
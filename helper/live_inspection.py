@@ -0,0 +1,117 @@
+from helper.instrumentation import instrumentation
+from helper.matching_engine import matching_engine
+
+# Used when the model sets neither live_every_n_frames nor live_detection_hz
+DEFAULT_DETECTION_HZ = 5.0
+
+
+def model_live_settings(model_info):
+    """ (every_n_frames or None, target_hz or None) from the model; Hz wins when both are set. """
+    model_info = model_info or {}
+    try:
+        target_hz = float(model_info.get('live_detection_hz') or 0) or None
+    except (TypeError, ValueError):
+        target_hz = None
+    try:
+        every_n = int(model_info.get('live_every_n_frames') or 0) or None
+    except (TypeError, ValueError):
+        every_n = None
+    if target_hz is None and every_n is None:
+        target_hz = DEFAULT_DETECTION_HZ
+    return (None if target_hz else every_n), target_hz
+
+
+def model_expected_count(model_info):
+    try:
+        return max(1, int((model_info or {}).get('detection_count') or 1))
+    except (TypeError, ValueError):
+        return 1
+
+
+class LiveInspector:
+    """
+    Runs the model's detector on camera frames at a fixed rate (every Nth frame or a target Hz)
+    through a BackgroundExecutor. A due frame is skipped while the previous detection is still
+    running, so a slow detector lowers the detection rate instead of stalling the preview.
+    The newest result is kept for drawing overlays on every preview frame.
+    """
+
+    def __init__(self, executor, model_info, on_result=None, on_error=None, engine=matching_engine):
+        self.executor = executor
+        self.model_info = model_info
+        self.engine = engine
+        self.on_result = on_result
+        self.on_error = on_error
+        self.every_n, self.target_hz = model_live_settings(model_info)
+        self.expected_count = model_expected_count(model_info)
+
+        self.last_index = None
+        self.last_time = None
+        self.job = None
+        self.result = None
+        self.result_ok = None
+        self.latency_ms = None
+        self.last_trace = None  # Stage timings of the newest finished detection, None while one is running
+
+    def is_due(self, frame):
+        if self.last_index is None:
+            return True
+        if self.target_hz:
+            return frame.timestamp - self.last_time >= 1.0 / self.target_hz
+        return frame.index - self.last_index >= self.every_n
+
+    def can_accept(self, frame):
+        return self.is_due(frame) and not self.executor.is_busy()
+
+    def offer(self, frame):
+        """ Called with every new preview frame; submits it for detection when it is due. """
+        if not self.can_accept(frame):
+            return False
+        self.last_index = frame.index
+        self.last_time = frame.timestamp
+        self.last_trace = None
+        self.job = self.executor.submit(self.detect, frame.image,
+                                        on_done=lambda result: self.handle_result(result, frame),
+                                        on_error=self.handle_error)
+        return True
+
+    def detect(self, image, progress=None):
+        # Runs on the executor's thread; one timed cycle per detection
+        with instrumentation.cycle(f"live:{self.model_info.get('name')}") as trace:
+            result = self.engine.match_frame(self.model_info, image, progress=progress)
+        self.last_trace = trace
+        return result
+
+    def handle_result(self, result, frame):
+        if self.job is None:
+            return  # Finished after the inspection was stopped
+        self.result = result
+        self.result_ok = result.count >= self.expected_count
+        # Glass to decision: from the moment the frame was grabbed until the result is on the Tk thread
+        self.latency_ms = frame.age() * 1000
+        if self.on_result:
+            self.on_result(result, self.result_ok, self.latency_ms)
+
+    def handle_error(self, error):
+        print(f"Live detection failed: {error}")
+        if self.on_error:
+            self.on_error(error)
+
+    def stop(self):
+        if self.job:
+            self.job.cancel()
+            self.job = None
+
+    def draw_overlay(self, image_rgb, scale=1.0):
+        """ Draws the newest result onto an RGB frame in place; scale maps frame to image coordinates. """
+        import cv2
+
+        if self.result is None:
+            return image_rgb
+        color = (0, 200, 0) if self.result_ok else (220, 0, 0)
+        for i, (box, score) in enumerate(zip(self.result.boxes, self.result.scores)):
+            x1, y1, x2, y2 = (int(v * scale) for v in box)
+            cv2.rectangle(image_rgb, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(image_rgb, f'#{i + 1} {score:.1f}%', (x1, max(y1 - 8, 12)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+        return image_rgb
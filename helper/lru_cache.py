@@ -0,0 +1,34 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """ Dict with a size limit that evicts the least recently used entry first. """
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self.items = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            self.items.move_to_end(key)
+        except KeyError:
+            return default
+        return self.items[key]
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_items:
+            self.items.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self.items.pop(key, default)
+
+    def clear(self):
+        self.items.clear()
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
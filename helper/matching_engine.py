@@ -0,0 +1,98 @@
+import time
+
+from helper.instrumentation import instrumentation
+from helper.model_store import model_store
+
+# cv2/numpy and the matching modules are imported on first use, so importing the engine
+# (or a GUI that holds one) stays cheap until a model is actually matched
+
+
+class MatchResult:
+    """ Outcome of matching one frame against one model. """
+
+    def __init__(self, model_name, boxes, scores, centers, contours, count_10_percent, elapsed_ms):
+        self.model_name = model_name
+        self.boxes = [tuple(int(v) for v in box) for box in boxes]
+        self.scores = [float(score) for score in scores]
+        self.centers = [(int(cx), int(cy)) for cx, cy in centers]
+        self.contours = list(contours)
+        self.count_10_percent = int(count_10_percent)
+        self.elapsed_ms = elapsed_ms
+
+    @property
+    def count(self):
+        return len(self.boxes)
+
+    def to_dict(self):
+        # Contours are left out, they are only needed for drawing
+        return {
+            'model': self.model_name,
+            'count': self.count,
+            'boxes': [list(box) for box in self.boxes],
+            'scores': [round(score, 2) for score in self.scores],
+            'centers': [list(center) for center in self.centers],
+            'count_10_percent': self.count_10_percent,
+            'elapsed_ms': round(self.elapsed_ms, 2),
+        }
+
+
+class MatchingEngine:
+    """
+    Tk-free entry point to object matching: load a model from the model store, then match
+    frames (a path, a BGR/RGB colour array or a grayscale array) against it.
+    """
+
+    def __init__(self, store=model_store):
+        self.store = store
+
+    def load_models(self):
+        return self.store.all()
+
+    def load_model(self, model_name):
+        """ Returns the model's info dict with its reference objects cached, or None. """
+        model = self.store.get(model_name)
+        if model is None:
+            print(f"Model {model_name} not found in {self.store.db_path}")
+            return None
+        return model if self.prepare_model(model) else None
+
+    def prepare_model(self, model):
+        # Extracts the reference objects now instead of on the first frame
+        from helper.object_matching import extract_reference_objects
+        from helper.reference_cache import reference_cache
+
+        if reference_cache.get_objects(model['image_path'], extract_reference_objects) is None:
+            print(f"Error loading reference image {model['image_path']}")
+            return False
+        return True
+
+    def binarize_frame(self, frame):
+        import cv2
+        from helper.object_matching import binarize, load_binary_image
+
+        if isinstance(frame, str):
+            return load_binary_image(frame)
+        if frame is None:
+            return None
+        if frame.ndim == 3:
+            with instrumentation.stage("binarize"):
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return binarize(frame)
+
+    def match_frame(self, model, frame, threshold=0.8, overlap_thresh=0.3, prefilter=None, progress=None):
+        """ Matches one frame against the model; progress(stage) is forwarded to the matcher. """
+        from helper.object_matching import find_and_match_object
+
+        start = time.perf_counter()
+        binary_frame = self.binarize_frame(frame)
+        if binary_frame is None:
+            raise ValueError(f"Could not load frame {frame if isinstance(frame, str) else ''}".strip())
+
+        boxes, scores, centers, contours, count_10_percent = find_and_match_object(
+            model['image_path'], binary_frame, threshold=threshold, overlap_thresh=overlap_thresh,
+            prefilter=prefilter, progress=progress)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        return MatchResult(model.get('name'), boxes, scores, centers, contours, count_10_percent, elapsed_ms)
+
+
+matching_engine = MatchingEngine()
@@ -0,0 +1,199 @@
+import json
+import os
+import sqlite3
+import threading
+from itertools import groupby
+
+DB_PATH = "models.db"
+JSON_PATH = "model_info.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS additional_images (
+    model_name TEXT NOT NULL REFERENCES models(name) ON DELETE CASCADE ON UPDATE CASCADE,
+    position INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (model_name, position)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class ModelStore:
+    """
+    Model library in SQLite. Lookups go through the name index, and every change is one
+    transaction touching only its own rows, so a crash mid-save leaves the previous state intact.
+
+    The database is the source of truth, but model_info.json stays editable for settings that
+    have no UI (camera, live_detection_hz, ...): whenever the file's mtime or size changes it is
+    read again, and only the keys that differ from the last read are merged into the stored
+    models, so an edit to one key does not undo changes made in the app since. Models new to the
+    file are added whole; models deleted in the app stay deleted even if their entry in the
+    file is edited. Removing a model or a key from the file deletes nothing.
+    """
+
+    def __init__(self, db_path=DB_PATH, json_path=JSON_PATH):
+        self.db_path = db_path
+        self.json_path = json_path
+        self.connection = None
+        self.lock = threading.RLock()
+
+    def connect(self):
+        if self.connection is None:
+            connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA foreign_keys = ON")
+            # WAL keeps readers going during a save; FULL sync makes a committed save survive power loss
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = FULL")
+            with connection:
+                connection.executescript(SCHEMA)
+            self.connection = connection
+        self.sync_json()
+        return self.connection
+
+    def meta_value(self, key):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def sync_json(self):
+        """ Merges what changed in model_info.json since it was last read; a stat when it has not. """
+        try:
+            stat = os.stat(self.json_path) if self.json_path else None
+        except OSError:
+            stat = None
+        stamp = json.dumps([stat.st_mtime_ns, stat.st_size]) if stat else None
+        if stamp is None or stamp == self.meta_value('json_stamp'):
+            return
+        try:
+            with open(self.json_path, "r") as json_file:
+                models = json.load(json_file)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error decoding JSON from {self.json_path}: {e}")
+            return  # Try again on the next read rather than marking a broken file as read
+
+        snapshot = json.loads(self.meta_value('json_snapshot') or '{}')
+        if self.meta_value('json_imported') is not None and self.meta_value('json_snapshot') is None:
+            # Imported before edits were tracked: the file as it is now is the baseline, nothing is re-applied
+            models, snapshot = [], {model_info['name']: model_info for model_info in models}
+
+        changed = 0
+        connection = self.connection
+        with connection:
+            for model_info in models:
+                before = snapshot.get(model_info['name'])
+                edits = {key: value for key, value in model_info.items() if before is None or before.get(key) != value}
+                snapshot[model_info['name']] = model_info
+                if not edits:
+                    continue
+                stored = connection.execute("SELECT name, data FROM models WHERE name = ?",
+                                            (model_info['name'],)).fetchone()
+                if stored:
+                    merged = self.row_to_model(stored, self.additional_images(stored['name']))
+                    merged.update(edits, name=model_info['name'])
+                elif before is None:
+                    merged = dict(model_info)
+                else:
+                    # Deleted in the app since the last read; an edit to the file does not revive it
+                    continue
+                self.write_model(connection, merged)
+                changed += 1
+            connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                   [('json_imported', self.json_path), ('json_stamp', stamp),
+                                    ('json_snapshot', json.dumps(snapshot))])
+        if changed:
+            print(f"Merged {changed} models from {self.json_path} into {self.db_path}")
+
+    def write_model(self, connection, model_info):
+        data = {key: value for key, value in model_info.items() if key != 'additional_images'}
+        if 'additional_images' in model_info:
+            # Remembered so an emptied list reads back as [] rather than a missing key
+            data['has_additional_images'] = True
+        row = connection.execute("SELECT position FROM models WHERE name = ?", (model_info['name'],)).fetchone()
+        if row is None:
+            position = connection.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM models").fetchone()[0]
+            connection.execute("INSERT INTO models (name, position, data) VALUES (?, ?, ?)",
+                               (model_info['name'], position, json.dumps(data)))
+        else:
+            connection.execute("UPDATE models SET data = ? WHERE name = ?", (json.dumps(data), model_info['name']))
+
+        if 'additional_images' in model_info:
+            connection.execute("DELETE FROM additional_images WHERE model_name = ?", (model_info['name'],))
+            connection.executemany(
+                "INSERT INTO additional_images (model_name, position, path) VALUES (?, ?, ?)",
+                [(model_info['name'], i, path) for i, path in enumerate(model_info['additional_images'] or [])])
+
+    def additional_images(self, name):
+        rows = self.connection.execute("SELECT path FROM additional_images WHERE model_name = ? ORDER BY position",
+                                       (name,)).fetchall()
+        return [row['path'] for row in rows]
+
+    def row_to_model(self, row, images):
+        model_info = json.loads(row['data'])
+        if images or 'has_additional_images' in model_info:
+            model_info['additional_images'] = images
+        model_info.pop('has_additional_images', None)
+        return model_info
+
+    def all(self):
+        with self.lock:
+            connection = self.connect()
+            # One query for every model and its images; this runs while the task panel is built
+            rows = connection.execute(
+                "SELECT m.name, m.data, a.path FROM models m "
+                "LEFT JOIN additional_images a ON a.model_name = m.name "
+                "ORDER BY m.position, a.position").fetchall()
+            return [self.row_to_model(model_rows[0], [row['path'] for row in model_rows if row['path'] is not None])
+                    for model_rows in (list(group) for _, group in groupby(rows, key=lambda row: row['name']))]
+
+    def get(self, name):
+        with self.lock:
+            connection = self.connect()
+            row = connection.execute("SELECT name, data FROM models WHERE name = ?", (name,)).fetchone()
+            return self.row_to_model(row, self.additional_images(name)) if row else None
+
+    def save(self, model_info):
+        """ Inserts the model or merges model_info into the stored one (like dict.update). """
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                stored = connection.execute("SELECT name, data FROM models WHERE name = ?",
+                                            (model_info['name'],)).fetchone()
+                merged = self.row_to_model(stored, self.additional_images(stored['name'])) if stored else {}
+                merged.update(model_info)
+                self.write_model(connection, merged)
+
+    def add_additional_image(self, model_info, image_path):
+        """ Appends one image to the model's additional_images, creating the model if needed. """
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                if connection.execute("SELECT 1 FROM models WHERE name = ?", (model_info['name'],)).fetchone() is None:
+                    self.write_model(connection, dict(model_info, additional_images=[]))
+                position = connection.execute(
+                    "SELECT COALESCE(MAX(position), -1) + 1 FROM additional_images WHERE model_name = ?",
+                    (model_info['name'],)).fetchone()[0]
+                connection.execute("INSERT INTO additional_images (model_name, position, path) VALUES (?, ?, ?)",
+                                   (model_info['name'], position, image_path))
+
+    def delete(self, name):
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.execute("DELETE FROM models WHERE name = ?", (name,))
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+model_store = ModelStore()
@@ -0,0 +1,166 @@
+import time
+
+from helper.camera import camera_manager
+from helper.live_inspection import LiveInspector
+from helper.background_executor import BackgroundExecutor
+
+# Frames from different cameras count as simultaneous when their grab times are this close (seconds)
+DEFAULT_SYNC_TOLERANCE = 0.02
+
+# Frames kept per camera to look for a partner in the other streams
+PAIRING_BUFFER = 4
+
+
+def model_camera_streams(models):
+    """ {model name: (camera source, model info)} for every model that names its camera. """
+    streams = {}
+    for model in models or []:
+        source = model.get('camera')
+        if source is None or source == '':
+            continue
+        try:
+            source = int(source)  # device index; anything else is passed to VideoCapture as is
+        except (TypeError, ValueError):
+            pass
+        streams[model['name']] = (source, model)
+    return streams
+
+
+def pair_frames(frame_lists, tolerance=DEFAULT_SYNC_TOLERANCE):
+    """
+    Picks one frame per stream so all were grabbed within tolerance of each other, or returns None.
+    The anchor is the newest frame of the stream that is furthest behind, so the set is as recent
+    as the slowest camera allows.
+    """
+    if not frame_lists or any(not frames for frames in frame_lists.values()):
+        return None
+    anchor = min(frames[-1].timestamp for frames in frame_lists.values())
+
+    paired = {}
+    for name, frames in frame_lists.items():
+        frame = min(frames, key=lambda f: abs(f.timestamp - anchor))
+        if abs(frame.timestamp - anchor) > tolerance:
+            return None
+        paired[name] = frame
+    return paired
+
+
+class FrameSet:
+    """ One frame per camera, all grabbed within the sync tolerance. """
+
+    def __init__(self, frames):
+        self.frames = frames
+        timestamps = [frame.timestamp for frame in frames.values()]
+        self.timestamp = sum(timestamps) / len(timestamps)
+        self.spread = max(timestamps) - min(timestamps)
+        self.key = tuple(sorted((name, frame.index) for name, frame in frames.items()))
+
+
+class MultiCameraCapture:
+    """ Grabs from several cameras in parallel (one FrameGrabber thread each) and pairs their frames. """
+
+    def __init__(self, sources, tolerance=DEFAULT_SYNC_TOLERANCE, manager=camera_manager):
+        self.sources = dict(sources)  # name -> camera source
+        self.tolerance = tolerance
+        self.manager = manager
+        self.grabbers = {}
+
+    def open(self):
+        """ Opens every camera; returns the names of those that could not be opened. """
+        failed = []
+        for name, source in self.sources.items():
+            grabber = self.manager.get(source, buffer_size=PAIRING_BUFFER)
+            if grabber is None:
+                failed.append(name)
+            else:
+                self.grabbers[name] = grabber
+        return failed
+
+    def latest_set(self, after=None):
+        """ Newest synchronized FrameSet, or None when the streams are out of step or nothing is new. """
+        paired = pair_frames({name: grabber.recent() for name, grabber in self.grabbers.items()}, self.tolerance)
+        if paired is None:
+            return None
+        frame_set = FrameSet(paired)
+        if after is not None and frame_set.key == after.key:
+            return None
+        return frame_set
+
+    def wait_for_set(self, after=None, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            frame_set = self.latest_set(after)
+            if frame_set is not None:
+                return frame_set
+            time.sleep(0.002)
+        return None
+
+    def release(self):
+        # The devices stay warm in the camera manager; only the pairing buffer is dropped
+        for grabber in self.grabbers.values():
+            grabber.resize_buffer(1)
+        self.grabbers = {}
+
+
+class MultiCameraInspector:
+    """
+    Runs each camera's model on its own worker (one BackgroundExecutor per stream) and reports a
+    station decision once every stream has a result for the same synchronized frame set.
+    """
+
+    def __init__(self, root, streams, on_set_result=None, tolerance=DEFAULT_SYNC_TOLERANCE):
+        self.capture = MultiCameraCapture({name: source for name, (source, _) in streams.items()}, tolerance)
+        self.executors = {name: BackgroundExecutor(root, name=f"match-{name}") for name in streams}
+        self.inspectors = {
+            name: LiveInspector(self.executors[name], model,
+                                on_result=lambda result, ok, latency_ms, name=name:
+                                self.handle_result(name, result, ok, latency_ms),
+                                # A failed stream counts as NG so the set still completes
+                                on_error=lambda error, name=name: self.handle_result(name, None, False, None))
+            for name, (_, model) in streams.items()
+        }
+        self.on_set_result = on_set_result
+        self.last_set = None
+        self.pending_set = None
+        self.results = {}
+
+    def start(self):
+        """ Opens the cameras; streams whose camera cannot be opened are left out of the decision. """
+        failed = self.capture.open()
+        for name in failed:
+            self.inspectors.pop(name)
+            self.executors.pop(name).shutdown()
+        return failed
+
+    def tick(self):
+        """ Called periodically on the Tk thread; submits the newest frame set when every stream is free. """
+        frame_set = self.capture.latest_set(self.last_set)
+        if frame_set is None:
+            return None
+        self.last_set = frame_set
+        if self.pending_set is None and all(self.inspectors[name].can_accept(frame)
+                                            for name, frame in frame_set.frames.items()):
+            self.pending_set = frame_set
+            self.results = {}
+            for name, frame in frame_set.frames.items():
+                self.inspectors[name].offer(frame)
+        return frame_set
+
+    def handle_result(self, name, result, ok, latency_ms):
+        if self.pending_set is None:
+            return
+        self.results[name] = (result, ok, latency_ms)
+        if len(self.results) == len(self.inspectors):
+            frame_set, results = self.pending_set, self.results
+            self.pending_set = None
+            self.results = {}
+            if self.on_set_result:
+                self.on_set_result(frame_set, results, all(ok for _, ok, _ in results.values()))
+
+    def stop(self):
+        for inspector in self.inspectors.values():
+            inspector.stop()
+        for executor in self.executors.values():
+            executor.shutdown()
+        self.capture.release()
+        self.pending_set = None
@@ -0,0 +1,187 @@
+import cv2
+import numpy as np
+
+from helper.candidate_filter import prefilter_candidates
+from helper.instrumentation import instrumentation
+from helper.reference_cache import reference_cache
+
+
+def extract_objects(image):
+    blurred = cv2.GaussianBlur(image, (5, 5), 0)
+    thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                   cv2.THRESH_BINARY, 11, 2)
+    edged = cv2.Canny(thresh, 50, 150)
+    contours, _ = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    objects = []
+    for cnt in contours:
+        x, y, w, h = cv2.boundingRect(cnt)
+        if w == 0 or h == 0:
+            continue
+        obj = image[y:y + h, x:x + w]
+
+        M = cv2.moments(cnt)
+        if M["m00"] != 0:
+            cx = int(M["m10"] / M["m00"])
+            cy = int(M["m01"] / M["m00"])
+        else:
+            cx, cy = x + w // 2, y + h // 2
+
+        objects.append((obj, (x, y, w, h), (cx, cy), cnt))
+
+    return objects
+
+
+def non_max_suppression(boxes, overlapThresh, scores=None, classes=None):
+    """
+    Greedy suppression of (x1, y1, x2, y2) boxes, highest score first (largest y2 first without
+    scores). A box is dropped when its overlap with a kept box, relative to its own area, exceeds
+    overlapThresh. Boxes with different classes (e.g. model names) never suppress each other.
+    Returns the indices of the kept boxes in the order they were kept, so parallel lists can be
+    filtered with them.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64)
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    if classes is not None:
+        # Shift each class along x into its own band so different classes can never overlap
+        _, class_ids = np.unique(np.asarray(classes), return_inverse=True)
+        span = boxes[:, [0, 2]].max() - boxes[:, [0, 2]].min() + 2
+        boxes = boxes.copy()
+        boxes[:, [0, 2]] += (class_ids * span)[:, np.newaxis]
+
+    x1 = boxes[:, 0]
+    y1 = boxes[:, 1]
+    x2 = boxes[:, 2]
+    y2 = boxes[:, 3]
+
+    area = (x2 - x1 + 1) * (y2 - y1 + 1)
+    if scores is not None:
+        order = np.argsort(-np.asarray(scores, dtype=np.float64), kind="stable")
+    else:
+        order = np.argsort(y2, kind="stable")[::-1]
+
+    # Boxes sorted by x1: only the slice whose x range can reach box i is compared with it
+    by_x1 = np.argsort(x1, kind="stable")
+    sorted_x1 = x1[by_x1]
+    max_width = (x2 - x1).max()
+
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    pick = []
+    for i in order:
+        if suppressed[i]:
+            continue
+        pick.append(i)
+
+        lo = np.searchsorted(sorted_x1, x1[i] - max_width, side="left")
+        hi = np.searchsorted(sorted_x1, x2[i], side="right")
+        others = by_x1[lo:hi]
+        others = others[~suppressed[others]]
+
+        w = np.maximum(0, np.minimum(x2[i], x2[others]) - np.maximum(x1[i], x1[others]) + 1)
+        h = np.maximum(0, np.minimum(y2[i], y2[others]) - np.maximum(y1[i], y1[others]) + 1)
+        overlap = (w * h) / area[others]
+        suppressed[others[overlap > overlapThresh]] = True
+
+    return np.array(pick, dtype=np.int64)
+
+
+def extract_reference_objects(reference_image):
+    return extract_objects(binarize(reference_image))
+
+
+def find_and_match_object(reference_image_path, larger_image, threshold=0.8, overlap_thresh=0.3,
+                          prefilter=None, progress=None):
+    """
+    Detections of the reference objects in larger_image and how many scored contours reach 10%.
+    Only candidates that pass the geometric prefilter (helper.candidate_filter) are resized and
+    scored; with the default gates that means a box area between 1/4 and 4 times the reference
+    object's, so both the detections and the >= 10% count cover those candidates only.
+    prefilter=False scores every contour, as the matcher did before the prefilter existed.
+    """
+    # progress(stage) is called between stages; a background job uses it to report and to abort
+    progress = progress or (lambda stage: None)
+
+    # The model crop never changes once saved, so its objects and their SSIM statistics come from the cache
+    with instrumentation.stage("reference"):
+        reference_objects, reference_scorers = reference_cache.get_scorers(reference_image_path,
+                                                                           extract_reference_objects)
+    # larger_image is either an already binarized array or a path to decode
+    if isinstance(larger_image, str):
+        larger_image = load_binary_image(larger_image)
+
+    if reference_objects is None or larger_image is None:
+        instrumentation.fail("Error loading images.")
+        return [], [], [], [], 0
+
+    progress("extract")
+    with instrumentation.stage("extract"):
+        larger_objects = extract_objects(larger_image)
+    instrumentation.count("reference_objects", len(reference_objects))
+    instrumentation.count("candidates_extracted", len(larger_objects))
+
+    # Cheap geometric gates before any resize/SSIM; prefilter=False scores every contour
+    if prefilter is not False:
+        with instrumentation.stage("prefilter"):
+            larger_objects, removed = prefilter_candidates(larger_objects, reference_objects, prefilter)
+        instrumentation.count("candidates_prefiltered", len(larger_objects))
+        instrumentation.count("prefilter_removed", removed)
+
+    progress("score")
+    # Best SSIM of every surviving candidate over all reference objects, scored in batches
+    best_scores = np.zeros(len(larger_objects))
+    with instrumentation.stage("score"):
+        for scorer in reference_scorers:
+            if scorer is None or not scorer.valid or not larger_objects:
+                continue
+
+            ref_h, ref_w = scorer.shape
+            stack = np.stack([cv2.resize(larger_obj, (ref_w, ref_h)) for larger_obj, _, _, _ in larger_objects])
+            best_scores = np.maximum(best_scores, scorer.score(stack))
+
+    boxes = []
+    scores = []
+    centers = []
+    contours = []
+    count_10_percent = 0
+
+    for (larger_obj, (lx, ly, lw, lh), (lcx, lcy), larger_cnt), best_score in zip(larger_objects, best_scores):
+        if best_score * 100 >= threshold * 100 and best_score > 0:
+            boxes.append((lx, ly, lx + lw, ly + lh))
+            scores.append(best_score * 100)
+            centers.append((lcx, lcy))
+            contours.append(larger_cnt)
+
+        if best_score * 100 >= 10:
+            count_10_percent += 1
+
+    progress("nms")
+    instrumentation.count("nms_in", len(boxes))
+    if len(boxes) > 0:
+        with instrumentation.stage("nms"):
+            # Kept indices keep boxes, scores, centers and contours aligned
+            keep = non_max_suppression(np.array(boxes), overlap_thresh, scores=scores)
+            boxes = np.array(boxes)[keep].astype("int")
+            scores = [scores[i] for i in keep]
+            centers = [centers[i] for i in keep]
+            contours = [contours[i] for i in keep]
+    instrumentation.count("nms_out", len(boxes))
+    instrumentation.count("count_10_percent", count_10_percent)
+
+    return boxes, scores, centers, contours, count_10_percent
+
+
+def binarize(gray_image):
+    # Same cut as the old PIL path: values below 128 become 0, everything else 255
+    with instrumentation.stage("binarize"):
+        _, binary_image = cv2.threshold(gray_image, 127, 255, cv2.THRESH_BINARY)
+    return binary_image
+
+
+def load_binary_image(image_path):
+    with instrumentation.stage("decode"):
+        gray_image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if gray_image is None:
+        return None
+    return binarize(gray_image)
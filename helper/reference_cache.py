@@ -0,0 +1,116 @@
+import hashlib
+import os
+import pickle
+import threading
+
+import cv2
+import numpy as np
+
+from helper.ssim_scorer import SSIMScorer
+
+# Bump this whenever the reference extraction changes so stale cache files are ignored
+CACHE_VERSION = 2
+
+
+class ReferenceCache:
+    """
+    Keeps the extracted objects of model reference images in memory and on disk, and in memory
+    an SSIMScorer per object so its window statistics are computed once per image, not per frame.
+    Shared by every matching worker (one per camera stream), so lookups, stores and cache file
+    writes are locked.
+    """
+
+    def __init__(self, cache_dir="cache/reference"):
+        self.cache_dir = cache_dir
+        self.entries = {}  # image path -> (stat stamp, content hash, objects, scorers or None until asked for)
+        self.lock = threading.Lock()
+
+    def get_objects(self, image_path, extract):
+        path = os.path.abspath(image_path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            entry = self.entries.get(path)
+        if entry and entry[0] == stamp:
+            return entry[2]
+
+        with open(path, "rb") as image_file:
+            data = image_file.read()
+        digest = hashlib.sha1(data).hexdigest()
+
+        # Same content rewritten with a new mtime, just refresh the stamp
+        if entry and entry[1] == digest:
+            with self.lock:
+                self.entries[path] = (stamp, digest, entry[2], entry[3])
+            return entry[2]
+
+        objects = self.load_from_disk(digest)
+        if objects is None:
+            image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                return None
+            # Extracted outside the lock; two workers racing on a new model both get the same result
+            objects = extract(image)
+            self.save_to_disk(digest, objects)
+
+        with self.lock:
+            self.entries[path] = (stamp, digest, objects, None)
+        return objects
+
+    def get_scorers(self, image_path, extract):
+        """ (objects, SSIMScorer or None per object); (None, None) when the image cannot be read. """
+        objects = self.get_objects(image_path, extract)
+        if objects is None:
+            return None, None
+        path = os.path.abspath(image_path)
+        with self.lock:
+            entry = self.entries.get(path)
+        if entry and entry[2] is objects and entry[3] is not None:
+            return objects, entry[3]
+
+        scorers = [SSIMScorer(obj) if obj.size > 0 else None for obj, _, _, _ in objects]
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry and entry[2] is objects:
+                self.entries[path] = entry[:3] + (scorers,)
+        return objects, scorers
+
+    def cache_file(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}_v{CACHE_VERSION}.pkl")
+
+    def load_from_disk(self, digest):
+        try:
+            with open(self.cache_file(digest), "rb") as cache_file:
+                return pickle.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, ValueError) as e:
+            print(f"Ignoring corrupt reference cache {self.cache_file(digest)}: {e}")
+            return None
+
+    def save_to_disk(self, digest, objects):
+        # One writer at a time, or two workers would share the .tmp file
+        with self.lock:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                cache_path = self.cache_file(digest)
+                tmp_path = f"{cache_path}.tmp"
+                with open(tmp_path, "wb") as cache_file:
+                    pickle.dump(objects, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                print(f"Could not write reference cache for {digest}: {e}")
+
+    def invalidate(self, image_path=None):
+        with self.lock:
+            if image_path is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(os.path.abspath(image_path), None)
+
+
+reference_cache = ReferenceCache()
@@ -1,6 +1,5 @@
 import math
 import tkinter as tk
-from PIL import Image, ImageTk
 
 
 class RotatingRectangle:
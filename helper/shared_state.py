@@ -1,15 +1,13 @@
-from PIL import ImageTk
-
 class SharedImage:
     def __init__(self):
         self.image = None
         self.position = (0, 0)
         self.image_path = None  # Add this line
 
-    def set_image(self, image: ImageTk.PhotoImage):
+    def set_image(self, image: "ImageTk.PhotoImage"):
         self.image = image
 
-    def get_image(self) -> ImageTk.PhotoImage:
+    def get_image(self) -> "ImageTk.PhotoImage":
         return self.image
 
     def set_position(self, position):
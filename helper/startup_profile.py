@@ -0,0 +1,66 @@
+import sys
+import time
+from contextlib import contextmanager
+
+# Modules the boot path should not need; the report lists any that got imported anyway
+HEAVY_MODULES = ('cv2', 'numpy', 'skimage', 'PIL')
+
+
+class StartupProfiler:
+    """
+    Wall-clock timings of the boot phases, printed by --profile-startup. Phases nest, and
+    marks record events that happen after the window is up (e.g. the model icons arriving).
+    When not enabled, phase() and mark() do nothing.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.start = time.perf_counter()
+        self.phases = []  # [name, ms or None while running, depth]
+        self.depth = 0
+        self.reported = False
+
+    def enable(self):
+        self.enabled = True
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        entry = [name, None, self.depth]
+        self.phases.append(entry)
+        self.depth += 1
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry[1] = (time.perf_counter() - t0) * 1000
+            self.depth -= 1
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def mark(self, name):
+        if not self.enabled:
+            return
+        if self.reported:
+            print(f"[startup] {name}: at {self.elapsed_ms():.1f} ms", file=sys.stderr)
+        else:
+            self.phases.append([f"{name} (at {self.elapsed_ms():.1f} ms)", None, self.depth])
+
+    def report(self):
+        if not self.enabled:
+            return
+        lines = ["[startup] phase timings:"]
+        for name, ms, depth in self.phases:
+            timing = f"{ms:8.1f} ms" if ms is not None else " " * 11
+            lines.append(f"[startup] {timing}  {'  ' * depth}{name}")
+        lines.append(f"[startup] interactive after {self.elapsed_ms():.1f} ms")
+        loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+        lines.append(f"[startup] heavy modules loaded: {', '.join(loaded) if loaded else 'none'}")
+        print("\n".join(lines), file=sys.stderr)
+        self.reported = True
+
+
+startup_profiler = StartupProfiler()
@@ -20,6 +20,18 @@ class StatusBar:
         self.ng_label.pack(side='left')
         self.ng_label.pack_forget()
 
+        # Progress of a background matching job, empty when idle
+        self.progress_label = tk.Label(self.status_frame, text="", fg='gray', bg='white', font=("Helvetica", 10))
+        self.progress_label.pack(side='left', padx=(10, 0))
+
+        # Display rate of the live preview, empty when no video is shown
+        self.fps_label = tk.Label(self.status_frame, text="", fg='gray', bg='white', font=("Helvetica", 10))
+        self.fps_label.pack(side='left', padx=(10, 0))
+
+        # Stage breakdown of the last matching cycle, so a slow cycle shows where the time went
+        self.timing_label = tk.Label(self.status_frame, text="", fg='gray', bg='white', font=("Helvetica", 10))
+        self.timing_label.pack(side='left', padx=(10, 0))
+
     def set_status(self, status):
         if status == 'OK':
             self.ng_label.pack_forget()
@@ -27,3 +39,18 @@ class StatusBar:
         else:
             self.ok_label.pack_forget()
             self.ng_label.pack(side='left')
+
+    def set_progress(self, text):
+        self.progress_label.config(text=text)
+
+    def set_timing(self, breakdown, stream=None):
+        if not breakdown:
+            text = ""
+        elif stream is not None:
+            text = language.translate("stream_cycle_timing").format(stream=stream, breakdown=breakdown)
+        else:
+            text = language.translate("cycle_timing").format(breakdown=breakdown)
+        self.timing_label.config(text=text)
+
+    def set_fps(self, fps):
+        self.fps_label.config(text="" if fps is None else language.translate("preview_fps").format(fps=f"{fps:.1f}"))
@@ -0,0 +1,491 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from helper.lru_cache import LRUCache
+
+DEFAULT_ANGLE_STEP = 10.0  # degrees between templates of the coarse sweep
+MIN_ANGLE_STEP = 1.0  # refinement stops once the step gets this small
+REFINE_CANDIDATES = 3  # coarse hits refined at full resolution
+MIN_PYRAMID_TEMPLATE_SIDE = 24  # automatic pyramid depth keeps the coarsest template at least this big
+MAX_PYRAMID_LEVELS = 4
+PYRAMID_CANDIDATES = 5  # peaks of the coarsest level followed down the pyramid
+PYRAMID_SEARCH_RADIUS = 2  # pixels searched around each upsampled candidate
+PYRAMID_PRUNE_MARGIN = 0.02  # candidates scoring this far below the level's best are dropped
+COARSE_THRESHOLD_MARGIN = 0.15  # coarse levels score lower, so their peaks get this much slack
+PEAK_OVERSAMPLING = 3  # coarse peaks considered per wanted instance
+MAX_TEMPLATE_SETS = 32  # rotated template sets kept for (model image, search settings) pairs
+
+
+def to_gray(image):
+    """ PIL image or ndarray (RGB, RGBA or already gray) to a single channel uint8 array. """
+    array = np.asarray(image)
+    if array.dtype == bool:
+        array = array.astype(np.uint8) * 255
+    if array.ndim == 2:
+        return array
+    if array.shape[2] == 4:
+        return cv2.cvtColor(array, cv2.COLOR_RGBA2GRAY)
+    return cv2.cvtColor(array, cv2.COLOR_RGB2GRAY)
+
+
+def model_angle_settings(model_info):
+    """ Search range (+/- degrees) from 'rotation_angle' and coarse step from 'angle_step'. """
+
+    def number(key, default):
+        try:
+            return float((model_info or {}).get(key) or default)
+        except (TypeError, ValueError):
+            return default
+
+    angle_range = min(abs(number('rotation_angle', 0.0)), 180.0)
+    # Not 'angle': that is the part's pick/place angle shown in the properties panel, not a search step
+    angle_step = max(abs(number('angle_step', DEFAULT_ANGLE_STEP)), MIN_ANGLE_STEP)
+    return angle_range, angle_step
+
+
+def model_pyramid_levels(model_info):
+    """ Optional 'pyramid_levels' model setting; None lets the template size decide. """
+    try:
+        return int((model_info or {}).get('pyramid_levels'))
+    except (TypeError, ValueError):
+        return None
+
+
+def rotate_template(template, angle):
+    """ Rotates counter-clockwise on an enlarged canvas, with a mask of the pixels that came from the template. """
+    h, w = template.shape
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    cos_val, sin_val = abs(matrix[0, 0]), abs(matrix[0, 1])
+    new_w = int(np.ceil(h * sin_val + w * cos_val))
+    new_h = int(np.ceil(h * cos_val + w * sin_val))
+    matrix[0, 2] += new_w / 2 - w / 2
+    matrix[1, 2] += new_h / 2 - h / 2
+
+    rotated = cv2.warpAffine(template, matrix, (new_w, new_h), flags=cv2.INTER_LINEAR)
+    mask = cv2.warpAffine(np.full_like(template, 255), matrix, (new_w, new_h), flags=cv2.INTER_NEAREST)
+    return rotated, mask
+
+
+def model_detection_settings(model_info):
+    """ (detection_count, detection_order, threshold 0..1 or None) from the model properties. """
+    model_info = model_info or {}
+    try:
+        count = max(1, int(model_info.get('detection_count') or 1))
+    except (TypeError, ValueError):
+        count = 1
+    order = model_info.get('detection_order') or "Maximum Matching %"
+    try:
+        threshold = float(model_info.get('matching')) / 100
+    except (TypeError, ValueError):
+        threshold = None
+    return count, order, threshold
+
+
+def sort_detections(detections, order):
+    """ Sorts (score, top_left, (w, h), angle) detections by a detection_order value. """
+    def center(detection):
+        (x, y), (w, h) = detection[1], detection[2]
+        return x + w / 2, y + h / 2
+
+    if order == "Ascending X":
+        return sorted(detections, key=lambda d: center(d)[0])
+    if order == "Descending X":
+        return sorted(detections, key=lambda d: center(d)[0], reverse=True)
+    if order == "Ascending Y":
+        return sorted(detections, key=lambda d: center(d)[1])
+    if order == "Descending Y":
+        return sorted(detections, key=lambda d: center(d)[1], reverse=True)
+    return sorted(detections, key=lambda d: d[0], reverse=True)
+
+
+def match_once(image, template, mask=None):
+    """ Best TM_CCOEFF_NORMED score and its top-left corner, or (-1, None) when the template does not fit. """
+    if template.shape[0] > image.shape[0] or template.shape[1] > image.shape[1]:
+        return -1.0, None
+    result = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+    if mask is not None:
+        # Masked correlation is undefined on flat patches
+        result = np.nan_to_num(result, nan=-1.0, posinf=-1.0, neginf=-1.0)
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    return max_val, max_loc
+
+
+def pyramid_levels(template_shape, levels=None):
+    """ Number of pyrDown steps; None picks the deepest one that keeps the template usable. """
+    if levels is not None:
+        return max(0, int(levels))
+    side = min(template_shape)
+    count = 0
+    while count < MAX_PYRAMID_LEVELS and side / 2 >= MIN_PYRAMID_TEMPLATE_SIDE:
+        side /= 2
+        count += 1
+    return count
+
+
+def build_pyramid(image, levels):
+    pyramid = [image]
+    for _ in range(levels):
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+    return pyramid
+
+
+class PyramidTemplate:
+    """
+    Template (and optional mask) pyramid. The whole image is only searched at the coarsest
+    level; the best peaks there are followed down, each level matching a window of
+    +/- PYRAMID_SEARCH_RADIUS pixels around the upsampled position.
+    """
+
+    def __init__(self, template, mask=None, levels=None):
+        self.levels = pyramid_levels(template.shape, levels)
+        self.templates = build_pyramid(template, self.levels)
+        self.masks = [mask]
+        for level_template in self.templates[1:]:
+            self.masks.append(None if mask is None else cv2.resize(
+                mask, level_template.shape[::-1], interpolation=cv2.INTER_NEAREST))
+
+    @property
+    def size(self):
+        return self.templates[0].shape[::-1]
+
+    def response(self, image_pyramid, level):
+        """ TM_CCOEFF_NORMED map of the whole image at one level, or None when the template does not fit. """
+        template, mask = self.templates[level], self.masks[level]
+        image = image_pyramid[level]
+        if template.shape[0] > image.shape[0] or template.shape[1] > image.shape[1]:
+            return None
+        result = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+        if mask is not None:
+            # Masked correlation is undefined on flat patches
+            result = np.nan_to_num(result, nan=-1.0, posinf=-1.0, neginf=-1.0)
+        return result
+
+    def match(self, image_pyramid, candidates=PYRAMID_CANDIDATES):
+        """ Best (score, top_left) at full resolution, or (-1, None) when the template does not fit. """
+        levels = min(self.levels, len(image_pyramid) - 1)
+        result = self.response(image_pyramid, levels)
+        if result is None:
+            return -1.0, None
+        if levels == 0:
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            return max_val, max_loc
+
+        hits = find_peaks(result, candidates, min(self.templates[levels].shape) // 2)
+        for level in range(levels - 1, -1, -1):
+            hits = [self.match_window(image_pyramid[level], level, (2 * x, 2 * y)) for _, (x, y) in hits]
+            hits = [hit for hit in hits if hit[1] is not None]
+            if not hits:
+                return -1.0, None
+            best_score = max(hit[0] for hit in hits)
+            hits = [hit for hit in hits if hit[0] >= best_score - PYRAMID_PRUNE_MARGIN]
+        return max(hits, key=lambda hit: hit[0])
+
+    def match_all(self, image_pyramid, max_count, threshold=None, min_distance=None):
+        """
+        Up to max_count separate (score, top_left) instances scoring at least threshold, best first.
+        Coarse peaks are refined in order of their coarse score and the search stops once enough
+        instances passed.
+        """
+        levels = min(self.levels, len(image_pyramid) - 1)
+        result = self.response(image_pyramid, levels)
+        if result is None:
+            return []
+        if min_distance is None:
+            min_distance = min(self.size) // 2
+
+        coarse_threshold = None if threshold is None else threshold - COARSE_THRESHOLD_MARGIN
+        peaks = find_peaks(result, max_count * PEAK_OVERSAMPLING, max(1, min_distance >> levels), coarse_threshold)
+
+        found = []
+        for _, top_left in peaks:
+            score, top_left = self.descend(image_pyramid, levels, top_left)
+            if top_left is None or (threshold is not None and score < threshold):
+                continue
+            if any(max(abs(top_left[0] - x), abs(top_left[1] - y)) < min_distance for _, (x, y) in found):
+                continue
+            found.append((score, top_left))
+            if len(found) == max_count:
+                break
+        return sorted(found, key=lambda hit: hit[0], reverse=True)
+
+    def descend(self, image_pyramid, level, top_left):
+        """ Follows one hit found at level down to full resolution. """
+        score = None
+        for finer in range(level - 1, -1, -1):
+            score, top_left = self.match_window(image_pyramid[finer], finer, (2 * top_left[0], 2 * top_left[1]))
+            if top_left is None:
+                return -1.0, None
+        if score is None:
+            # Already at full resolution, take the response value at the hit
+            score, top_left = self.match_window(image_pyramid[0], 0, top_left, radius=0)
+        return score, top_left
+
+    def match_window(self, image, level, top_left, radius=PYRAMID_SEARCH_RADIUS):
+        template, mask = self.templates[level], self.masks[level]
+        h, w = template.shape
+        x0 = max(0, top_left[0] - radius)
+        y0 = max(0, top_left[1] - radius)
+        x1 = min(image.shape[1], top_left[0] + w + radius)
+        y1 = min(image.shape[0], top_left[1] + h + radius)
+        score, loc = match_once(image[y0:y1, x0:x1], template, mask)
+        if loc is None:
+            return -1.0, None
+        return score, (loc[0] + x0, loc[1] + y0)
+
+
+def find_peaks(response, max_count, min_distance, threshold=None):
+    """
+    Up to max_count (score, (x, y)) local maxima of a response map, best first, no two closer than
+    min_distance (Chebyshev). Candidates come from one dilation pass; the greedy separation check
+    only runs until max_count peaks are kept.
+    """
+    distance = max(1, int(min_distance))
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * distance + 1, 2 * distance + 1))
+    is_peak = response >= cv2.dilate(response, kernel)
+    if threshold is not None:
+        is_peak &= response >= threshold
+    ys, xs = np.nonzero(is_peak)
+    if len(xs) == 0:
+        return []
+
+    scores = response[ys, xs]
+    order = np.argsort(-scores, kind='stable')
+    kept_x = np.empty(max_count, dtype=np.int64)
+    kept_y = np.empty(max_count, dtype=np.int64)
+    peaks = []
+    for index in order:
+        x, y = xs[index], ys[index]
+        count = len(peaks)
+        # Plateaus give several equal maxima next to each other, keep only the first
+        if count and np.any((np.abs(kept_x[:count] - x) < distance) & (np.abs(kept_y[:count] - y) < distance)):
+            continue
+        kept_x[count], kept_y[count] = x, y
+        peaks.append((float(scores[index]), (int(x), int(y))))
+        if len(peaks) == max_count:
+            break
+    return peaks
+
+
+class RotatedTemplates:
+    """
+    Rotated copies of one model template (each with its own pyramid), built once and
+    reused for every image. Every coarse angle is matched over the coarsest pyramid level
+    only; the best hits are followed down the pyramid and their angle is then refined by
+    halving the step, matching full resolution templates in a small window.
+    """
+
+    def __init__(self, template, angle_range=0.0, angle_step=DEFAULT_ANGLE_STEP, min_step=MIN_ANGLE_STEP,
+                 levels=None):
+        self.template = template
+        self.angle_range = angle_range
+        self.angle_step = angle_step
+        self.min_step = min_step
+        self.levels = pyramid_levels(template.shape, levels)
+        self.rotations = {}  # angle -> PyramidTemplate
+
+        for angle in self.coarse_angles():
+            self.rotated(angle)
+
+    def coarse_angles(self):
+        if self.angle_range <= 0:
+            return [0.0]
+        count = int(self.angle_range // self.angle_step)
+        angles = [0.0]
+        for k in range(1, count + 1):
+            angles += [k * self.angle_step, -k * self.angle_step]
+        return angles
+
+    def rotated(self, angle):
+        key = round(angle, 3)
+        if key not in self.rotations:
+            if angle == 0:
+                self.rotations[key] = PyramidTemplate(self.template, levels=self.levels)
+            else:
+                rotated, mask = rotate_template(self.template, angle)
+                self.rotations[key] = PyramidTemplate(rotated, mask, levels=self.levels)
+        return self.rotations[key]
+
+    def search(self, image):
+        """ Returns (score, top_left, (width, height), angle) of the best match in a gray image. """
+        image_pyramid = build_pyramid(image, self.levels)
+
+        if self.angle_range <= 0:
+            score, top_left = self.rotated(0.0).match(image_pyramid)
+            if top_left is None:
+                # Template bigger than the image; matchTemplate swaps the two like it always did
+                result = cv2.matchTemplate(image, self.template, cv2.TM_CCOEFF_NORMED)
+                _, score, _, top_left = cv2.minMaxLoc(result)
+            return score, top_left, self.template.shape[::-1], 0.0
+
+        coarse_hits = []
+        for angle in self.coarse_angles():
+            score, top_left = self.match_coarse(image_pyramid, angle)
+            if top_left is not None:
+                coarse_hits.append((score, angle, top_left))
+
+        # The coarse sweep can rank near-equal hits wrongly, so refine the best few of them
+        coarse_hits.sort(key=lambda hit: hit[0], reverse=True)
+        best = None
+        for _, coarse_angle, top_left in coarse_hits[:REFINE_CANDIDATES]:
+            found = self.refine(image_pyramid, coarse_angle, top_left)
+            if found and (best is None or found[0] > best[0]):
+                best = found
+
+        if best is None:
+            return -1.0, (0, 0), self.template.shape[::-1], 0.0
+        return best
+
+    def search_all(self, image, max_count=1, threshold=None, min_distance=None):
+        """
+        Up to max_count separate (score, top_left, (width, height), angle) instances scoring at least
+        threshold (0..1, None accepts anything), best first. Instances closer than min_distance
+        (default half the template's short side) are treated as the same part.
+        """
+        if max_count == 1:
+            best = self.search(image)
+            if best[0] < 0 or (threshold is not None and best[0] < threshold):
+                return []
+            return [best]
+
+        if min_distance is None:
+            min_distance = min(self.template.shape) // 2
+        image_pyramid = build_pyramid(image, self.levels)
+
+        if self.angle_range <= 0:
+            pyramid = self.rotated(0.0)
+            hits = pyramid.match_all(image_pyramid, max_count, threshold, min_distance)
+            return [(score, top_left, pyramid.size, 0.0) for score, top_left in hits]
+
+        # Peaks of every coarse angle compete in one list, strongest first
+        coarse_threshold = None if threshold is None else threshold - COARSE_THRESHOLD_MARGIN
+        coarse_distance = max(1, min_distance >> self.levels)
+        coarse_hits = []
+        for angle in self.coarse_angles():
+            result = self.rotated(angle).response(image_pyramid, self.levels)
+            if result is None:
+                continue
+            for score, top_left in find_peaks(result, max_count * PEAK_OVERSAMPLING, coarse_distance,
+                                              coarse_threshold):
+                coarse_hits.append((score, angle, top_left))
+        coarse_hits.sort(key=lambda hit: hit[0], reverse=True)
+
+        found = []
+        centers = []
+        for _, angle, top_left in coarse_hits:
+            w, h = self.rotated(angle).templates[self.levels].shape[::-1]
+            coarse_center = ((top_left[0] + w / 2) * 2 ** self.levels, (top_left[1] + h / 2) * 2 ** self.levels)
+            if self.near_any(coarse_center, centers, min_distance):
+                continue
+            refined = self.refine(image_pyramid, angle, top_left)
+            if refined is None or (threshold is not None and refined[0] < threshold):
+                continue
+            (x, y), (w, h) = refined[1], refined[2]
+            center = (x + w / 2, y + h / 2)
+            if self.near_any(center, centers, min_distance):
+                continue
+            found.append(refined)
+            centers.append(center)
+            if len(found) == max_count:
+                break
+        return sorted(found, key=lambda hit: hit[0], reverse=True)
+
+    @staticmethod
+    def near_any(point, points, distance):
+        return any(max(abs(point[0] - x), abs(point[1] - y)) < distance for x, y in points)
+
+    def match_coarse(self, image_pyramid, angle):
+        pyramid = self.rotated(angle)
+        return match_once(image_pyramid[self.levels], pyramid.templates[self.levels], pyramid.masks[self.levels])
+
+    def refine(self, image_pyramid, coarse_angle, top_left):
+        """ Follows a coarse hit down the pyramid, then halves the angle step around it at full resolution. """
+        pyramid = self.rotated(coarse_angle)
+        score = None
+        for level in range(self.levels - 1, -1, -1):
+            score, top_left = pyramid.match_window(image_pyramid[level], level, (2 * top_left[0], 2 * top_left[1]))
+            if top_left is None:
+                return None
+        w, h = pyramid.size
+        best = (score, top_left, (w, h), coarse_angle) if score is not None else None
+        center = (top_left[0] + w / 2, top_left[1] + h / 2)
+        margin = 2 * PYRAMID_SEARCH_RADIUS + 2
+
+        step = self.angle_step
+        angles = [coarse_angle] if best is None else []
+        while True:
+            for angle in angles:
+                if abs(angle) > self.angle_range:
+                    continue
+                found = self.match_near(image_pyramid[0], angle, center, margin)
+                if found and (best is None or found[0] > best[0]):
+                    best = found
+            if step / 2 < self.min_step:
+                return best
+            step /= 2
+            middle = best[3] if best else coarse_angle
+            angles = [middle - step, middle + step]
+
+    def match_near(self, image, angle, center, margin):
+        pyramid = self.rotated(angle)
+        w, h = pyramid.size
+        top_left = (int(round(center[0] - w / 2)), int(round(center[1] - h / 2)))
+        score, top_left = pyramid.match_window(image, 0, top_left, radius=margin)
+        if top_left is None:
+            return None
+        return score, top_left, (w, h), angle
+
+
+# Rotated template sets are built once per model image and search settings; the file's stamp is part of
+# the key so a rewritten model crop gets new templates, and the least recently used sets are dropped
+_rotated_templates = LRUCache(MAX_TEMPLATE_SETS)
+_rotated_templates_lock = threading.Lock()
+
+
+def get_rotated_templates(key, template, angle_range, angle_step, levels=None):
+    try:
+        stat = os.stat(key) if key is not None else None
+    except OSError:
+        stat = None
+    if stat is None:
+        return RotatedTemplates(template, angle_range, angle_step, levels=levels)
+    cache_key = (key, stat.st_mtime_ns, stat.st_size, angle_range, angle_step, levels, template.shape)
+    # Several stream workers may ask at once; building happens outside the lock
+    with _rotated_templates_lock:
+        templates = _rotated_templates.get(cache_key)
+    if templates is None:
+        templates = RotatedTemplates(template, angle_range, angle_step, levels=levels)
+        with _rotated_templates_lock:
+            _rotated_templates.put(cache_key, templates)
+    return templates
+
+
+def model_templates(primary_img, model_info):
+    """ The model's rotated template set for its rotation_angle/angle/pyramid_levels settings. """
+    primary_img_cv = to_gray(primary_img)
+
+    # The model's rotation_angle/angle set the search range and step; 0 keeps the plain 0° match
+    angle_range, angle_step = model_angle_settings(model_info)
+    template_key = model_info.get('image_path') if model_info else None
+    return get_rotated_templates(template_key, primary_img_cv, angle_range, angle_step,
+                                 levels=model_pyramid_levels(model_info))
+
+
+def calculate_match_percentage(primary_img, additional_img, model_info=None):
+    """ Best match of the model image in additional_img: (percent, top_left, bottom_right, angle). """
+    templates = model_templates(primary_img, model_info)
+    max_val, top_left, (w, h), angle = templates.search(to_gray(additional_img))
+
+    # Bounding box of the (rotated) template
+    bottom_right = (top_left[0] + w, top_left[1] + h)
+
+    return max_val * 100, top_left, bottom_right, angle  # Convert to percentage
+
+
+def rotated_box_points(top_left, bottom_right, size, angle):
+    """ Corners of the model footprint (size = unrotated width, height) rotated by angle inside the match box. """
+    center = ((top_left[0] + bottom_right[0]) / 2, (top_left[1] + bottom_right[1]) / 2)
+    # RotatedRect angles are clockwise, template rotations counter-clockwise
+    return np.int32(cv2.boxPoints((center, size, -angle)))
@@ -0,0 +1,183 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from helper.lru_cache import LRUCache
+
+THUMBNAIL_WIDTH = 100
+
+# Decoded full images kept in RAM; everything else is re-read from disk on demand
+MAX_FULL_IMAGES = 6
+
+# In-memory images written to disk are kept up to this total size and age; the oldest go first
+MAX_SPILLED_BYTES = 512 * 2 ** 20
+MAX_SPILLED_AGE = 7 * 24 * 3600  # seconds
+
+
+class ImageRef:
+    """ A thumbnail strip entry: its cache key and the file the full image can be read from.
+    Files are keyed by content hash, computed when the thumbnail is first needed; in-memory
+    images get a unique key when they are registered. """
+
+    def __init__(self, key, path):
+        self.key = key
+        self.path = path
+
+
+class ThumbnailCache:
+    """
+    Thumbnails on disk keyed by the hash of their source, and full images loaded only when asked
+    for. Images that only exist in memory (annotated results, camera frames) are written to
+    images_dir once so they can be dropped from RAM and read back later; that directory is kept
+    under max_spilled_bytes and max_spilled_age by deleting the oldest files that no ImageRef
+    (e.g. a thumbnail strip entry) still points to.
+    """
+
+    def __init__(self, cache_dir="cache/thumbnails", images_dir="cache/images", max_full_images=MAX_FULL_IMAGES,
+                 max_spilled_bytes=MAX_SPILLED_BYTES, max_spilled_age=MAX_SPILLED_AGE):
+        self.cache_dir = cache_dir
+        self.images_dir = images_dir
+        self.max_spilled_bytes = max_spilled_bytes
+        self.max_spilled_age = max_spilled_age
+        self.full_images = LRUCache(max_full_images)
+        self.path_keys = {}  # source path -> ((mtime_ns, size), key)
+        # In-memory images waiting to be written; they stay readable from here until they are on disk
+        self.pending = {}
+        # Spilled images someone still holds a ref to; pruning never deletes these
+        self.live_refs = weakref.WeakValueDictionary()
+        self.lock = threading.Lock()
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-spill")
+
+    def register(self, image):
+        """ Returns an ImageRef for a file path or a PIL image. """
+        if isinstance(image, str):
+            return ImageRef(None, image)
+
+        # A unique key instead of a content hash: hashing a full capture would stall the Tk thread
+        key = uuid.uuid4().hex
+        ref = ImageRef(key, os.path.join(self.images_dir, f"{key}.png"))
+        with self.lock:
+            self.live_refs[key] = ref
+            # PNG encoding a capture takes ~200 ms, so it is written off the Tk thread
+            self.pending[key] = image
+            self.writer.submit(self.spill, key, image, ref.path)
+            # The image was just produced, it is likely to be shown right away
+            self.full_images.put(key, image)
+        return ref
+
+    def spill(self, key, image, path):
+        try:
+            os.makedirs(self.images_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            image.save(tmp_path, format="PNG", compress_level=1)
+            os.replace(tmp_path, path)
+            with self.lock:
+                self.pending.pop(key, None)
+        except OSError as e:
+            # Keep it in memory then, losing the image would be worse than the RAM
+            print(f"Could not spill image to {path}: {e}")
+            return
+        self.prune_spilled()
+
+    def prune_spilled(self):
+        """ Deletes the oldest spilled images, and their thumbnails, beyond the size and age caps. """
+        try:
+            files = [(entry.stat().st_mtime, entry.stat().st_size, entry.path, entry.name)
+                     for entry in os.scandir(self.images_dir) if entry.name.endswith(".png")]
+        except OSError:
+            return
+        files.sort()
+        total = sum(size for _, size, _, _ in files)
+        oldest_kept = time.time() - self.max_spilled_age
+        for mtime, size, path, name in files:
+            if total <= self.max_spilled_bytes and mtime >= oldest_kept:
+                break
+            key = name[:-len(".png")]
+            with self.lock:
+                if key in self.pending or key in self.live_refs:
+                    continue
+            try:
+                os.remove(path)
+                total -= size
+                os.remove(os.path.join(self.cache_dir, f"{key}_{THUMBNAIL_WIDTH}.png"))
+            except OSError:
+                pass  # Already gone, or it never had a thumbnail
+
+    def file_key(self, path):
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        known = self.path_keys.get(path)
+        if known and known[0] == stamp:
+            return known[1]
+        with open(path, "rb") as image_file:
+            key = hashlib.sha1(image_file.read()).hexdigest()
+        self.path_keys[path] = (stamp, key)
+        return key
+
+    def ensure_key(self, ref):
+        if ref.key is None:
+            ref.key = self.file_key(ref.path)
+        return ref.key
+
+    def thumbnail(self, ref, width=THUMBNAIL_WIDTH):
+        from PIL import Image
+
+        try:
+            self.ensure_key(ref)
+        except OSError as e:
+            print(f"Error reading image {ref.path}: {e}")
+            return None
+        thumb_path = os.path.join(self.cache_dir, f"{ref.key}_{width}.png")
+        try:
+            with Image.open(thumb_path) as cached:
+                cached.load()
+                return cached
+        except (OSError, ValueError):
+            pass
+
+        image = self.load_full(ref)
+        if image is None:
+            return None
+        h_size = max(1, int(image.size[1] * width / float(image.size[0])))
+        # reducing_gap lets PIL shrink by an integer factor first, far cheaper than LANCZOS on every pixel
+        thumb = image.resize((width, h_size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{thumb_path}.tmp"
+            thumb.save(tmp_path, format="PNG")
+            os.replace(tmp_path, thumb_path)
+        except OSError as e:
+            print(f"Could not write thumbnail {thumb_path}: {e}")
+        return thumb
+
+    def load_full(self, ref):
+        from PIL import Image
+
+        try:
+            self.ensure_key(ref)
+        except OSError as e:
+            print(f"Error reading image {ref.path}: {e}")
+            return None
+        # Thumbnails are made on the strip's worker while clicks load full images on the Tk thread
+        with self.lock:
+            image = self.full_images.get(ref.key)
+            if image is None:
+                image = self.pending.get(ref.key)
+        if image is not None:
+            return image
+        try:
+            image = Image.open(ref.path)
+            image.load()
+        except OSError as e:
+            print(f"Error loading image {ref.path}: {e}")
+            return None
+        with self.lock:
+            self.full_images.put(ref.key, image)
+        return image
+
+
+thumbnail_cache = ThumbnailCache()
@@ -0,0 +1,68 @@
+import math
+
+# Display tiles are TILE_SIZE x TILE_SIZE canvas pixels at every zoom
+TILE_SIZE = 256
+
+
+class TilePyramid:
+    """
+    Multi-resolution view of one image for the zoomable ImageView. Level k is the image reduced
+    by 2**k and is only built the first time a zoom needs it. A display tile is cut from the
+    smallest level that still has at least one source pixel per screen pixel.
+    """
+
+    def __init__(self, image, tile_size=TILE_SIZE):
+        if image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGB")
+        self.levels = [image]
+        self.size = image.size
+        self.tile_size = tile_size
+
+    def level_for_zoom(self, zoom):
+        if zoom >= 1.0:
+            return 0
+        level = int(math.floor(math.log2(1.0 / zoom)))
+        # No point in levels smaller than a single tile
+        max_level = max(0, int(math.ceil(math.log2(max(self.size) / self.tile_size))))
+        return min(level, max_level)
+
+    def level_image(self, level):
+        while len(self.levels) <= level:
+            self.levels.append(self.levels[-1].reduce(2))
+        return self.levels[level]
+
+    def display_size(self, zoom):
+        return max(1, int(math.ceil(self.size[0] * zoom))), max(1, int(math.ceil(self.size[1] * zoom)))
+
+    def tile_grid(self, zoom):
+        display_w, display_h = self.display_size(zoom)
+        return int(math.ceil(display_w / self.tile_size)), int(math.ceil(display_h / self.tile_size))
+
+    def visible_tiles(self, zoom, origin, view_size):
+        """ (col, row) of the tiles that intersect the view; origin is the image's top left in view pixels. """
+        cols, rows = self.tile_grid(zoom)
+        ox, oy = origin
+        view_w, view_h = view_size
+        t = self.tile_size
+        col0, col1 = max(0, int((0 - ox) // t)), min(cols - 1, int((view_w - ox) // t))
+        row0, row1 = max(0, int((0 - oy) // t)), min(rows - 1, int((view_h - oy) // t))
+        return [(col, row) for row in range(row0, row1 + 1) for col in range(col0, col1 + 1)]
+
+    def render_tile(self, zoom, col, row):
+        """ The (col, row) display tile at zoom as a PIL image, at most tile_size square. """
+        display_w, display_h = self.display_size(zoom)
+        t = self.tile_size
+        x0, y0 = col * t, row * t
+        w, h = min(t, display_w - x0), min(t, display_h - y0)
+        if w <= 0 or h <= 0:
+            return None
+
+        from PIL import Image
+
+        level = self.level_for_zoom(zoom)
+        source = self.level_image(level)
+        # Display pixels -> source pixels of the chosen level
+        ratio = 1.0 / (zoom * 2 ** level)
+        box = (x0 * ratio, y0 * ratio, min(source.width, (x0 + w) * ratio), min(source.height, (y0 + h) * ratio))
+        resample = Image.Resampling.NEAREST if ratio < 0.5 else Image.Resampling.BILINEAR
+        return source.resize((w, h), resample, box=box)
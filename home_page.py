@@ -2,21 +2,33 @@ import os
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
-import numpy as np
-from PIL import Image, ImageTk, ImageDraw, ImageOps
-import cv2
-import json
 import time
 
 from helper.icon_loader import load_icons
+from helper.camera import WARMUP_FRAMES, camera_manager
+from helper.instrumentation import instrumentation
 from helper.language import language
+from helper.live_inspection import LiveInspector
+from helper.background_executor import BackgroundExecutor
+from helper.model_store import model_store
+from helper.multi_camera import MultiCameraCapture, MultiCameraInspector, model_camera_streams
+from helper.startup_profile import startup_profiler
 from helper.status_bar import StatusBar
 from partials.image_view import ImageView
 from partials.properties_panel import PropertiesPanel
 from helper.shared_state import SharedImage
 from partials.task_panel import TaskPanel
 from menu import MenuBar
-from partials.image_matching import find_and_match_object, calculate_and_display_matches  # Import the matching function
+
+
+# cv2/numpy, PIL and the matching modules are imported where they are first used so the
+# window can paint before OpenCV has loaded
+
+
+def match_uploaded_image(model_info, larger_image_path, progress=None):
+    # Runs on the match executor's thread, so the first OpenCV import happens there too
+    from partials.image_matching import compute_match_image
+    return compute_match_image(model_info, larger_image_path, progress=progress)
 
 
 class HomeScreen:
@@ -31,7 +43,8 @@ class HomeScreen:
         self.selected_model_info = None  # Initialize the selected_model_info attribute
 
         # Load icons using the imported function
-        self.icons = load_icons()
+        with startup_profiler.phase("load icons"):
+            self.icons = load_icons()
 
         # Define commands for menu actions
         self.commands = {
@@ -46,14 +59,25 @@ class HomeScreen:
         }
 
         self.video_capture_active = False  # Add a flag to control video capture
+        self.frame_grabber = None  # Warm grabber from the camera manager while video is shown
+        self.last_frame_index = -1
+        self.live_inspector = None  # Runs the selected model on the video stream
+        self.multi_inspector = None  # Runs every camera's model when several cameras are configured
+        self.preview_stream = None  # Camera shown in the view during multi-camera inspection
+
+        # Matching runs off the Tk thread; a new upload supersedes the one in flight
+        self.match_executor = BackgroundExecutor(self.root)
 
-        self.create_menu_bar()
+        with startup_profiler.phase("menu bar"):
+            self.create_menu_bar()
 
-        # Create the status bar
-        self.status_bar = StatusBar(self.menu_bar)
+            # Create the status bar
+            self.status_bar = StatusBar(self.menu_bar)
 
-        self.create_sections()
-        self.create_task_panel()
+        with startup_profiler.phase("image view and properties"):
+            self.create_sections()
+        with startup_profiler.phase("task panel"):
+            self.create_task_panel()
         self.properties_panel.set_image_view(self.image_view)
 
     def create_menu_bar(self):
@@ -96,6 +120,9 @@ class HomeScreen:
     def quit_app(self):
         self.task_panel.reset_buttons()
         print("Exit selected")
+        self.stop_video_capture()
+        self.match_executor.shutdown()
+        camera_manager.release_all()
         self.root.quit()
 
     def capture_image(self):
@@ -117,44 +144,139 @@ class HomeScreen:
 
     def stop_video_capture(self):
         self.video_capture_active = False
+        if self.live_inspector:
+            self.live_inspector.stop()
+            self.live_inspector = None
+            self.status_bar.set_progress("")
+        if self.multi_inspector:
+            self.multi_inspector.stop()
+            self.multi_inspector = None
+            self.status_bar.set_progress("")
+        # The grabber itself stays open in the camera manager for the next snapshot or video
+        self.frame_grabber = None
+        self.image_view.stop_video_preview()
+        self.status_bar.set_fps(None)
+
+    def camera_streams(self):
+        # Models with a 'camera' entry map a device to the model inspected on it
+        from helper.matching_engine import matching_engine
+        return model_camera_streams(matching_engine.load_models())
 
     def capture_from_webcam(self, video=False):
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
+        import cv2
+        from PIL import Image
+        streams = self.camera_streams()
+        if video:
+            if len(streams) > 1:
+                self.start_multi_camera(streams)
+            else:
+                self.start_frame_grabber()
+            return
+        if len(streams) > 1:
+            self.capture_synchronized(streams)
+            return
+
+        # Served from the warm stream; only the first snapshot pays for opening the device
+        frame = camera_manager.snapshot(0)
+        if frame is None:
             print("Could not open webcam")
             return
 
-        if not video:
-            ret, frame = cap.read()
-            if ret:
-                img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img_pil = Image.fromarray(img)
-                img_tk = ImageTk.PhotoImage(img_pil)
-                self.shared_image.set_image(img_tk)
-                self.image_view.current_image = img_pil
-                self.image_view.zoom_factor = 1.0
-                self.image_view.center_image_on_canvas(img_tk)
-                self.image_view.add_thumbnail(img_pil)
-                self.image_view.update_image()
-            cap.release()
-        else:
-            self.root.after(10, self.update_video_frame, cap)
-
-    def update_video_frame(self, cap):
-        if self.video_capture_active:
-            ret, frame = cap.read()
-            if ret:
-                img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img_pil = Image.fromarray(img)
-                img_tk = ImageTk.PhotoImage(img_pil)
-                self.shared_image.set_image(img_tk)
-                self.image_view.current_image = img_pil
-                self.image_view.zoom_factor = 1.0
-                self.image_view.center_image_on_canvas(img_tk)
-                self.image_view.update_image()
-            self.root.after(10, self.update_video_frame, cap)
-        else:
-            cap.release()
+        img = cv2.cvtColor(frame.image, cv2.COLOR_BGR2RGB)
+        img_pil = Image.fromarray(img)
+        self.image_view.show_image(img_pil)
+        self.image_view.add_thumbnail(img_pil)
+
+    def capture_synchronized(self, streams):
+        import cv2
+        from PIL import Image
+        capture = MultiCameraCapture({name: source for name, (source, _) in streams.items()})
+        failed = capture.open()
+        if failed:
+            print(f"Could not open cameras: {', '.join(failed)}")
+        frame_set = capture.wait_for_set()
+        capture.release()
+        if frame_set is None:
+            print("Cameras did not deliver frames within the sync tolerance")
+            return
+
+        print(f"Captured {len(frame_set.frames)} cameras, spread {frame_set.spread * 1000:.1f} ms")
+        # Every camera becomes a thumbnail; the first one is shown in the view
+        for name, frame in sorted(frame_set.frames.items()):
+            img_pil = Image.fromarray(cv2.cvtColor(frame.image, cv2.COLOR_BGR2RGB))
+            self.image_view.add_thumbnail(img_pil)
+            if name == min(frame_set.frames):
+                self.image_view.show_image(img_pil)
+
+    def start_multi_camera(self, streams):
+        self.multi_inspector = MultiCameraInspector(self.root, streams, on_set_result=self.on_station_result)
+        failed = self.multi_inspector.start()
+        if failed:
+            print(f"Could not open cameras: {', '.join(failed)}")
+        if not self.multi_inspector.capture.grabbers:
+            self.multi_inspector.stop()
+            self.multi_inspector = None
+            self.video_capture_active = False
+            return
+
+        # Preview the selected model's camera, or the first one
+        selected = self.selected_model_info.get('name') if self.selected_model_info else None
+        self.preview_stream = selected if selected in self.multi_inspector.capture.grabbers \
+            else min(self.multi_inspector.capture.grabbers)
+        self.frame_grabber = self.multi_inspector.capture.grabbers[self.preview_stream]
+        self.live_inspector = None
+        self.last_frame_index = WARMUP_FRAMES - 1
+        self.root.after(10, self.update_video_frame)
+
+    def on_station_result(self, frame_set, results, ok):
+        self.set_status('OK' if ok else 'NG')
+        # The station waits for its slowest camera, so that stream's stages are the ones worth showing
+        traces = [(name, inspector.last_trace) for name, inspector in self.multi_inspector.inspectors.items()
+                  if inspector.last_trace is not None]
+        if traces:
+            name, trace = max(traces, key=lambda item: item[1].total_ms)
+            self.status_bar.set_timing(instrumentation.format_breakdown(trace), stream=name)
+        passed = sum(1 for _, stream_ok, _ in results.values() if stream_ok)
+        self.status_bar.set_progress(language.translate("station_result").format(
+            passed=passed, total=len(results), spread=f"{frame_set.spread * 1000:.0f}"))
+
+    def start_frame_grabber(self):
+        self.frame_grabber = camera_manager.get(0)
+        if self.frame_grabber is None:
+            print("Could not open webcam")
+            self.video_capture_active = False
+            return
+        # Skip the under-exposed frames of a freshly opened device
+        self.last_frame_index = WARMUP_FRAMES - 1
+
+        # With a model selected the preview doubles as live inspection
+        if self.selected_model_info:
+            self.live_inspector = LiveInspector(self.match_executor, self.selected_model_info,
+                                                on_result=self.on_live_result, on_error=self.on_matching_error)
+        self.root.after(10, self.update_video_frame)
+
+    def update_video_frame(self):
+        if not self.video_capture_active or not self.frame_grabber:
+            return
+
+        if self.multi_inspector:
+            # Hands the newest synchronized set to the per-camera matchers when they are all free
+            self.multi_inspector.tick()
+
+        # Only the newest grabbed frame is shown; the Tk thread never waits on the camera
+        frame = self.frame_grabber.latest(self.last_frame_index)
+        if frame is not None:
+            self.last_frame_index = frame.index
+            # Overlays show the newest finished detection, which may be a few frames old
+            draw_overlay = None
+            if self.live_inspector:
+                self.live_inspector.offer(frame)
+                draw_overlay = self.live_inspector.draw_overlay
+            elif self.multi_inspector:
+                draw_overlay = self.multi_inspector.inspectors[self.preview_stream].draw_overlay
+            self.image_view.show_video_frame(frame.image, draw_overlay)
+            self.status_bar.set_fps(self.image_view.preview_fps.fps())
+        self.root.after(10, self.update_video_frame)
 
     def upload_image(self):
         self.stop_video_capture()  # Stop any ongoing video capture
@@ -173,15 +295,10 @@ class HomeScreen:
         self.root.update()  # Ensure any pending events are processed
         file_path = filedialog.askopenfilename()
         if file_path:
+            from PIL import Image
             img = Image.open(file_path)
-            img_full = img.copy()
-            img_full_tk = ImageTk.PhotoImage(img_full)
-            self.shared_image.set_image(img_full_tk)
-            self.image_view.current_image = img
-            self.image_view.zoom_factor = 1.0
-            self.image_view.center_image_on_canvas(img_full_tk)
+            self.image_view.show_image(img)
             self.image_view.clear_thumbnails()
-            self.image_view.update_image()
 
             model_info = self.selected_model_info
             if model_info:
@@ -190,26 +307,48 @@ class HomeScreen:
                 if self.task_panel.active_button:
                     self.task_panel.active_button.config(bg='#00008B')
 
-                # Calculate and display match percentages
-                calculate_and_display_matches(self.image_view, model_info['image_path'], file_path)
+                # Calculate match percentages in the background and display them when done
+                self.start_matching(model_info, file_path)
             else:
                 print("Model info not found.")  # Debugging line
                 messagebox.showerror("Error",
                                      "Please select a model or add a new model before uploading an image.")  # Show error message
 
+    def start_matching(self, model_info, larger_image_path):
+        self.on_matching_progress("queued")
+        self.match_executor.submit(match_uploaded_image, model_info, larger_image_path,
+                                   on_done=self.on_matching_done, on_error=self.on_matching_error,
+                                   on_progress=self.on_matching_progress)
+
+    def on_matching_progress(self, stage):
+        stage_text = language.translate(f"stage_{stage}")
+        self.status_bar.set_progress(language.translate("matching_stage").format(stage=stage_text))
+
+    def on_matching_done(self, detected_image_pil):
+        self.status_bar.set_progress("")
+        self.status_bar.set_timing(instrumentation.format_breakdown())
+        if detected_image_pil is not None:
+            from partials.image_matching import show_match_image
+            show_match_image(self.image_view, detected_image_pil)
+
+    def on_live_result(self, result, ok, latency_ms):
+        self.set_status('OK' if ok else 'NG')
+        self.status_bar.set_timing(instrumentation.format_breakdown())
+        self.status_bar.set_progress(language.translate("live_result").format(count=result.count,
+                                                                              latency=f"{latency_ms:.0f}"))
+
+    def on_matching_error(self, error):
+        print(f"Matching failed: {error}")
+        self.status_bar.set_progress(language.translate("matching_failed"))
+
     def upload_image_for_new_model(self):
         self.root.update()  # Ensure any pending events are processed
         file_path = filedialog.askopenfilename()
         if file_path:
+            from PIL import Image
             img = Image.open(file_path)
-            img_full = img.copy()
-            img_full_tk = ImageTk.PhotoImage(img_full)
-            self.shared_image.set_image(img_full_tk)
-            self.image_view.current_image = img
-            self.image_view.zoom_factor = 1.0
-            self.image_view.center_image_on_canvas(img_full_tk)
+            self.image_view.show_image(img)
             self.image_view.clear_thumbnails()
-            self.image_view.update_image()
 
             print("Image loaded for new model creation.")
 
@@ -222,68 +361,13 @@ class HomeScreen:
         img.save(unique_image_name)
         print(f"Image saved as {unique_image_name}")  # Debugging line
 
-        json_path = "model_info.json"
-        try:
-            with open(json_path, "r") as json_file:
-                data = json.load(json_file)
-        except (FileNotFoundError, json.JSONDecodeError):
-            data = []
-
-        model_updated = False
-        for model in data:
-            if model.get('name') == model_info['name']:
-                if 'additional_images' not in model:
-                    model['additional_images'] = []
-                model['additional_images'].append(unique_image_name)
-                model_updated = True
-                break
-
-        if not model_updated:
-            model_info['additional_images'] = [unique_image_name]
-            data.append(model_info)
-
-        with open(json_path, "w") as json_file:
-            json.dump(data, json_file, indent=4)
+        model_store.add_additional_image(model_info, unique_image_name)
 
         print(f"Uploaded image saved to {unique_image_name} and model info updated.")  # Debugging line
 
     def display_image_in_view(self, model_info):
-        try:
-            self.image_view.clear_thumbnails()
-
-            image_path = model_info.get('image_path', '')
-            primary_img = Image.open(image_path)
-            primary_img_full = primary_img.copy()
-            primary_img_full_tk = ImageTk.PhotoImage(primary_img_full)
-            self.image_view.add_thumbnail(primary_img_full)
-            self.image_view.shared_image.set_image(primary_img_full_tk)
-            self.image_view.current_image = primary_img
-            self.image_view.zoom_factor = 1.0
-            self.image_view.center_image_on_canvas(primary_img_full_tk)
-            self.image_view.update_image()
-
-            if 'additional_images' in model_info:
-                for additional_image_path in model_info['additional_images']:
-                    additional_img = Image.open(additional_image_path)
-                    match_percentage, top_left, bottom_right, angle = self.task_panel.calculate_match_percentage(
-                        primary_img, additional_img)
-
-                    additional_img_cv = cv2.cvtColor(np.array(additional_img), cv2.COLOR_RGB2BGR)
-                    cv2.putText(additional_img_cv, f'{match_percentage:.2f}%', (top_left[0], top_left[1] - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2, cv2.LINE_AA)
-                    cv2.rectangle(additional_img_cv, top_left, bottom_right, (0, 255, 0), 2)
-
-                    center = (top_left[0] + bottom_right[0]) // 2, (top_left[1] + bottom_right[1]) // 2
-                    M = cv2.getRotationMatrix2D(center, angle, 1.0)
-                    additional_img_cv = cv2.warpAffine(additional_img_cv, M,
-                                                       (additional_img_cv.shape[1], additional_img_cv.shape[0]))
-
-                    additional_img = Image.fromarray(cv2.cvtColor(additional_img_cv, cv2.COLOR_BGR2RGB))
-
-                    self.image_view.add_thumbnail(additional_img)
-
-        except Exception as e:
-            print(f"Error loading image {image_path}: {e}")
+        # Same detect_instances matching and drawing as a click on the model button
+        self.task_panel.display_image_in_view(model_info)
 
     def set_status(self, status):
         if status == 'OK':
@@ -319,12 +403,16 @@ class HomeScreen:
         self.restart_app()
 
     def restart_app(self):
+        self.stop_video_capture()
+        self.match_executor.shutdown()
         self.root.destroy()
         new_root = tk.Tk()
         app = HomeScreen(new_root, self.shared_image)
         new_root.mainloop()
 
     def reinitialize(self):
+        self.stop_video_capture()
+        self.match_executor.shutdown()
         for widget in self.root.winfo_children():
             widget.destroy()
         self.__init__(self.root, self.shared_image)
@@ -333,6 +421,7 @@ class HomeScreen:
         self.properties_panel.show_empty_properties()
         self.image_view.clear_thumbnails()
         self.image_view.canvas.delete("all")
+        self.image_view.clear_image()
 
     def clear_and_refresh(self):
         self.clear_view()
@@ -1,14 +1,42 @@
-import tkinter as tk
-from helper.shared_state import SharedImage
-from home_page import HomeScreen
+import argparse
 
+from helper.instrumentation import log_to_file
+from helper.startup_profile import startup_profiler
+
+
+def start_app(profile_startup=False):
+    if profile_startup:
+        startup_profiler.enable()
+    # Per-stage timings of every matching cycle, one JSON line each
+    log_to_file()
+
+    with startup_profiler.phase("import modules"):
+        import tkinter as tk
+        from helper.camera import camera_manager
+        from helper.shared_state import SharedImage
+        from home_page import HomeScreen
 
-def start_app():
     shared_image = SharedImage()
-    root = tk.Tk()
-    HomeScreen(root, shared_image)
+    with startup_profiler.phase("create window"):
+        root = tk.Tk()
+    with startup_profiler.phase("build home screen"):
+        HomeScreen(root, shared_image)
+    if profile_startup:
+        with startup_profiler.phase("first paint"):
+            root.update()
+        startup_profiler.report()
+
     root.mainloop()
+    # Cameras are kept open between captures, close them however the window was closed
+    camera_manager.release_all()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Start the inspection station.")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print import and phase timings to stderr once the window is usable")
+    return parser.parse_args(argv)
 
 
 if __name__ == '__main__':
-    start_app()
+    start_app(parse_args().profile_startup)
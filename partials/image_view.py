@@ -1,15 +1,44 @@
 import math
 import os
 import tkinter as tk
+from collections import deque
 from datetime import time
 
-from PIL import Image, ImageTk
-import json
 from helper.language import language
+from helper.lru_cache import LRUCache
+from helper.model_store import model_store
 from helper.rotating_rectangle import RotatingRectangle
+from helper.thumbnail_cache import thumbnail_cache
+from partials.thumbnail_strip import ThumbnailStrip
+from helper.tile_pyramid import TilePyramid
 import time  # Ensure time module is imported
-import cv2  # Add this import
-import numpy as np  # Add this import
+
+# Rendered tiles kept for re-use while panning and zooming back and forth
+TILE_CACHE_SIZE = 256
+MAX_ZOOM = 16.0
+ZOOM_STEP = 1.25
+
+
+class FpsCounter:
+    """ Frames per second over a sliding window. """
+
+    def __init__(self, window=1.0):
+        self.window = window
+        self.times = deque()
+
+    def tick(self):
+        now = time.monotonic()
+        self.times.append(now)
+        while self.times and now - self.times[0] > self.window:
+            self.times.popleft()
+
+    def fps(self):
+        if len(self.times) < 2:
+            return 0.0
+        return (len(self.times) - 1) / (self.times[-1] - self.times[0])
+
+    def reset(self):
+        self.times.clear()
 
 
 class ImageView(tk.Frame):
@@ -21,10 +50,20 @@ class ImageView(tk.Frame):
         self.image_id = None
         self.zoom_factor = 1.0
         self.current_image = None
-        self.thumbnails = []
-        self.selected_thumbnail = None
         self.rotating_rectangle = None
 
+        # Still images are drawn as tiles from a pyramid; view_origin is the image's top left on
+        # the canvas and zoom_factor the canvas pixels per image pixel
+        self.pyramid = None
+        self.pyramid_id = 0
+        self.view_origin = (0, 0)
+        self.tile_items = {}  # (col, row) -> (canvas item, PhotoImage) currently on the canvas
+        self.tile_cache = LRUCache(TILE_CACHE_SIZE)
+
+        # Live preview: one PhotoImage at canvas size, pasted into for every frame
+        self.preview_photo = None
+        self.preview_fps = FpsCounter()
+
         self.create_widgets()
 
     def create_widgets(self):
@@ -37,25 +76,116 @@ class ImageView(tk.Frame):
         self.canvas = tk.Canvas(self, bg='white')
         self.canvas.pack(fill='both', expand=True)
 
-        self.thumbnail_frame = tk.Frame(self, bg='white')
-        self.thumbnail_frame.pack(fill='x', side='bottom')
-
-        self.scrollbar = tk.Scrollbar(self.thumbnail_frame, orient=tk.HORIZONTAL)
-        self.scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
-
-        self.thumbnail_canvas = tk.Canvas(self.thumbnail_frame, bg='white', height=100,
-                                          xscrollcommand=self.scrollbar.set)
-        self.thumbnail_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.scrollbar.config(command=self.thumbnail_canvas.xview)
-
-        self.thumb_container = tk.Frame(self.thumbnail_canvas, bg='white')
-        self.thumb_container.bind("<Configure>", lambda e: self.thumbnail_canvas.configure(
-            scrollregion=self.thumbnail_canvas.bbox("all")))
-        self.thumbnail_canvas.create_window((0, 0), window=self.thumb_container, anchor="nw")
+        # Only the visible thumbnails are drawn, so the strip scales to a whole shift of captures
+        self.thumbnail_strip = ThumbnailStrip(self, self.on_thumbnail_click)
+        self.thumbnail_strip.pack(fill='x', side='bottom')
 
         self.canvas.bind("<Button-1>", self.on_mouse_click)
         self.canvas.bind("<B1-Motion>", self.on_mouse_drag)
         self.canvas.bind("<ButtonRelease-1>", self.on_mouse_release)
+        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)  # Windows / macOS
+        self.canvas.bind("<Button-4>", self.on_mouse_wheel)  # X11 scroll up
+        self.canvas.bind("<Button-5>", self.on_mouse_wheel)  # X11 scroll down
+        self.canvas.bind("<Configure>", lambda e: self.render_tiles())
+
+    def show_image(self, img):
+        """ Shows a still PIL image fitted to the canvas; only the visible tiles are ever rendered. """
+        self.clear_image()
+        self.current_image = img
+        self.pyramid = TilePyramid(img)
+        self.pyramid_id += 1
+
+        canvas_w, canvas_h = max(1, self.canvas.winfo_width()), max(1, self.canvas.winfo_height())
+        img_w, img_h = self.pyramid.size
+        # Large captures start fitted to the view, small ones at 1:1 as before
+        self.zoom_factor = min(1.0, canvas_w / img_w, canvas_h / img_h)
+        display_w, display_h = self.pyramid.display_size(self.zoom_factor)
+        self.set_view_origin(((canvas_w - display_w) // 2, (canvas_h - display_h) // 2))
+        self.render_tiles()
+
+    def clear_tiles(self):
+        self.canvas.delete("tile")
+        self.tile_items = {}
+        self.tile_cache.clear()
+        self.pyramid = None
+
+    def clear_image(self):
+        """ Removes the still image tiles and the single image item (video preview). """
+        self.clear_tiles()
+        if self.image_id:
+            self.canvas.delete(self.image_id)
+            self.image_id = None
+        self.shared_image.set_image(None)
+        self.preview_photo = None
+
+    def set_view_origin(self, origin):
+        self.view_origin = origin
+        self.shared_image.set_position(origin)
+
+    def render_tiles(self):
+        if not self.pyramid:
+            return
+        from PIL import ImageTk  # PIL is not needed until there is something to draw
+        canvas_size = (self.canvas.winfo_width(), self.canvas.winfo_height())
+        visible = set(self.pyramid.visible_tiles(self.zoom_factor, self.view_origin, canvas_size))
+
+        for key in list(self.tile_items):
+            if key not in visible:
+                self.canvas.delete(self.tile_items.pop(key)[0])
+
+        ox, oy = self.view_origin
+        t = self.pyramid.tile_size
+        for col, row in visible:
+            if (col, row) in self.tile_items:
+                continue
+            cache_key = (self.pyramid_id, self.zoom_factor, col, row)
+            photo = self.tile_cache.get(cache_key)
+            if photo is None:
+                tile = self.pyramid.render_tile(self.zoom_factor, col, row)
+                if tile is None:
+                    continue
+                photo = ImageTk.PhotoImage(tile)
+                self.tile_cache.put(cache_key, photo)
+            # The item holds its own reference so an evicted tile stays alive while it is shown
+            item = self.canvas.create_image(round(ox + col * t), round(oy + row * t), anchor='nw', image=photo,
+                                            tags="tile")
+            self.tile_items[(col, row)] = (item, photo)
+        # Tiles stay under the crop rectangle and its handles
+        self.canvas.tag_lower("tile")
+
+    def pan_to(self, origin):
+        dx, dy = round(origin[0]) - round(self.view_origin[0]), round(origin[1]) - round(self.view_origin[1])
+        self.canvas.move("tile", dx, dy)
+        self.set_view_origin(origin)
+        self.render_tiles()
+
+    def zoom_at(self, factor, x, y):
+        """ Zooms by factor keeping the image point under canvas position (x, y) in place. """
+        if not self.pyramid:
+            return
+        img_w, img_h = self.pyramid.size
+        fit = min(1.0, self.canvas.winfo_width() / img_w, self.canvas.winfo_height() / img_h)
+        new_zoom = min(MAX_ZOOM, max(fit / 2, self.zoom_factor * factor))
+        if new_zoom == self.zoom_factor:
+            return
+        ox, oy = self.view_origin
+        ratio = new_zoom / self.zoom_factor
+        self.zoom_factor = new_zoom
+        self.canvas.delete("tile")
+        self.tile_items = {}
+        self.set_view_origin((x - (x - ox) * ratio, y - (y - oy) * ratio))
+        self.render_tiles()
+
+    def on_mouse_wheel(self, event):
+        if getattr(event, 'num', None) == 5 or getattr(event, 'delta', 0) < 0:
+            self.zoom_at(1 / ZOOM_STEP, event.x, event.y)
+        else:
+            self.zoom_at(ZOOM_STEP, event.x, event.y)
+
+    def canvas_to_image(self, x, y):
+        """ Canvas position -> pixel position in current_image at the current pan and zoom. """
+        ox, oy = self.view_origin
+        return (x - ox) / self.zoom_factor, (y - oy) / self.zoom_factor
 
     def center_image_on_canvas(self, img_tk):
         canvas_width = self.canvas.winfo_width()
@@ -64,21 +194,17 @@ class ImageView(tk.Frame):
         img_height = img_tk.height()
         x = (canvas_width - img_width) // 2
         y = (canvas_height - img_height) // 2
-        self.shared_image.set_position((x, y))
+        self.set_view_origin((x, y))
         if self.image_id:
             self.canvas.coords(self.image_id, x, y)
         else:
             self.image_id = self.canvas.create_image(x, y, anchor='nw', image=img_tk)
 
     def clear_thumbnails(self):
-        for widget in self.thumb_container.winfo_children():
-            widget.destroy()
-        self.thumbnails = []  # Clear the thumbnails list
+        self.thumbnail_strip.clear()
 
     def clear_canvas(self):
-        for widget in self.thumb_container.winfo_children():
-            widget.destroy()
-        self.thumbnails = []  # Clear the thumbnails list
+        self.thumbnail_strip.clear()
 
     def on_mouse_click(self, event):
         if self.rotating_rectangle and (self.rotating_rectangle.is_point_inside_rectangle(event.x, event.y) or
@@ -102,10 +228,58 @@ class ImageView(tk.Frame):
                                         self.rotating_rectangle.dragging_circle):
             self.rotating_rectangle.stop_drag(event)
 
+    def show_video_frame(self, frame_bgr, draw_overlay=None):
+        """
+        Shows a BGR camera frame scaled down to the canvas. The frame is resized with cv2 before
+        colour conversion, and the same PhotoImage is reused while the display size stays the same.
+        draw_overlay(image_rgb, scale) may draw on the scaled frame. The unscaled frame without overlay
+        stays current_image, so a crop cut from the preview is at camera resolution. Returns the display scale.
+        """
+        import cv2
+        from PIL import Image, ImageTk
+
+        frame_h, frame_w = frame_bgr.shape[:2]
+        canvas_w, canvas_h = self.canvas.winfo_width(), self.canvas.winfo_height()
+        scale = min(1.0, canvas_w / frame_w, canvas_h / frame_h) if canvas_w > 1 and canvas_h > 1 else 1.0
+        display_w, display_h = max(1, int(frame_w * scale)), max(1, int(frame_h * scale))
+
+        if scale < 1.0:
+            # INTER_LINEAR is several times cheaper than INTER_AREA at non-integer ratios, plenty for a preview
+            preview_bgr = cv2.resize(frame_bgr, (display_w, display_h), interpolation=cv2.INTER_LINEAR)
+        else:
+            preview_bgr = frame_bgr
+        img = cv2.cvtColor(preview_bgr, cv2.COLOR_BGR2RGB)
+        if draw_overlay:
+            draw_overlay(img, scale)
+        img_pil = Image.fromarray(img)
+
+        photo = self.preview_photo
+        if (photo is None or self.shared_image.get_image() is not photo
+                or (photo.width(), photo.height()) != (display_w, display_h)):
+            # First frame, canvas resized or another image was shown in between
+            self.clear_tiles()
+            photo = self.preview_photo = ImageTk.PhotoImage(img_pil)
+            self.shared_image.set_image(photo)
+            self.center_image_on_canvas(photo)
+            self.update_image()
+        else:
+            photo.paste(img_pil)
+
+        # Converted to RGB only when a crop is asked for; zoom_factor maps the canvas back to camera pixels
+        self.current_image = frame_bgr
+        self.zoom_factor = scale
+        self.preview_fps.tick()
+        return scale
+
+    def stop_video_preview(self):
+        self.preview_photo = None
+        self.preview_fps.reset()
+
     def update_image(self):
         img = self.shared_image.get_image()
         if img:
             pos = self.shared_image.get_position()
+            self.view_origin = pos
             if self.image_id is None:
                 self.image_id = self.canvas.create_image(pos[0], pos[1], anchor='nw', image=img)
             else:
@@ -115,42 +289,37 @@ class ImageView(tk.Frame):
 
 
     def add_thumbnail(self, img_full):
-        base_width = 100
-        w_percent = (base_width / float(img_full.size[0]))
-        h_size = int((float(img_full.size[1]) * float(w_percent)))
-        thumb_image = img_full.resize((base_width, h_size), Image.Resampling.LANCZOS)
-        thumb_image_tk = ImageTk.PhotoImage(thumb_image)
-        self.thumbnails.append((thumb_image_tk, img_full))
-
-        thumb_label = tk.Label(self.thumb_container, image=thumb_image_tk, bg='white', borderwidth=2, relief='solid')
-        thumb_label.image = thumb_image_tk
-        thumb_label.pack(side='left', padx=5, pady=5)
-        thumb_label.bind("<Button-1>", lambda e, full_img=img_full: self.on_thumbnail_click(thumb_label, full_img))
-
-    def on_thumbnail_click(self, thumb_label, img_full):
-        img_full_tk = ImageTk.PhotoImage(img_full)
-        self.shared_image.set_image(img_full_tk)
-        self.current_image = img_full
-        self.zoom_factor = 1.0
-        self.center_image_on_canvas(img_full_tk)
-        self.update_image()
-        self.highlight_thumbnail(thumb_label)
+        """ img_full is a PIL image or an image file path; only a reference to it is kept. """
+        self.thumbnail_strip.add(img_full)
+
+    def add_thumbnails(self, images):
+        """ Adds many images or paths with one strip redraw, e.g. a model's annotated additional images. """
+        self.thumbnail_strip.extend(images)
 
-    def highlight_thumbnail(self, thumb_label):
-        if self.selected_thumbnail and self.selected_thumbnail.winfo_exists():
-            self.selected_thumbnail.config(bg='white')
-        thumb_label.config(bg='green')
-        self.selected_thumbnail = thumb_label
+    def on_thumbnail_click(self, index, ref):
+        # Decoded on demand; recently viewed images stay in the cache's LRU
+        img_full = thumbnail_cache.load_full(ref)
+        if img_full is None:
+            return
+        self.show_image(img_full)
+        self.highlight_thumbnail(index)
+
+    def highlight_thumbnail(self, index):
+        self.thumbnail_strip.select(index)
 
     def move_image(self, event):
         x, y = event.x, event.y
+        if not hasattr(self, 'anchor_x'):
+            return
+        if self.pyramid:
+            self.pan_to((x - self.anchor_x, y - self.anchor_y))
+            return
         self.canvas.coords(self.image_id, x - self.anchor_x, y - self.anchor_y)
-        self.shared_image.set_position((x - self.anchor_x, y - self.anchor_y))
+        self.set_view_origin((x - self.anchor_x, y - self.anchor_y))
 
     def set_anchor(self, event):
-        bbox = self.canvas.bbox(self.image_id)
-        self.anchor_x = event.x - bbox[0]
-        self.anchor_y = event.y - bbox[1]
+        self.anchor_x = event.x - self.view_origin[0]
+        self.anchor_y = event.y - self.view_origin[1]
 
     def enable_rectangle_drawing(self):
         if not self.rotating_rectangle:
@@ -165,28 +334,33 @@ class ImageView(tk.Frame):
 
 
     def crop_and_save_image(self, model_info):
-        if not self.rotating_rectangle or not self.current_image:
+        import cv2  # Deferred so opening the window does not wait for OpenCV
+        import numpy as np
+        from PIL import Image
+
+        if not self.rotating_rectangle or self.current_image is None:
             print("Rotating rectangle or current image is missing")
             return
 
+        if isinstance(self.current_image, np.ndarray):
+            img_array = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2RGB)  # Camera frame from the live preview
+        else:
+            img_array = np.array(self.current_image)
+
         # Get the bounding box coordinates
         bbox = self.rotating_rectangle.get_rotated_coords()
-        print(f"Original image size: {self.current_image.size}")
+        print(f"Original image size: {img_array.shape[1]}x{img_array.shape[0]}")
         print(f"Bounding box for cropping: {bbox}")
 
+        # Convert canvas coordinates to image coordinates at the current pan and zoom
+        bbox = [self.canvas_to_image(x, y) for x, y in bbox]
+        print(f"Bounding box in image pixels (zoom {self.zoom_factor:.3f}): {bbox}")
+
         # Calculate the center of the bounding box
         center_x = sum(x for x, y in bbox) / len(bbox)
         center_y = sum(y for x, y in bbox) / len(bbox)
 
-        # Convert canvas coordinates to image coordinates
-        canvas_bbox = self.canvas.bbox(self.image_id)
-        print(f"Canvas bounding box: {canvas_bbox}")
-
-        # Convert the coordinates relative to the canvas
-        bbox = [(x - canvas_bbox[0], y - canvas_bbox[1]) for x, y in bbox]
-
         # Rotate the image to align the bounding box with axes
-        img_array = np.array(self.current_image)
         center = (center_x, center_y)
         angle_rad = math.radians(self.rotating_rectangle.angle)
         rot_mat = cv2.getRotationMatrix2D(center, self.rotating_rectangle.angle, 1.0)
@@ -210,12 +384,11 @@ class ImageView(tk.Frame):
         cropped_image_path = f"images/{model_info['name']}_{timestamp}.png"
         cropped_image.save(cropped_image_path)
 
-        # Save model info to JSON
+        # Save model info to the model store
         model_info['image_path'] = cropped_image_path
-        json_path = "model_info.json"
-        self.update_model_info_json(model_info, json_path)
+        model_store.save(model_info)
 
-        print(f"Model info saved to {json_path}")
+        print(f"Model info saved to {model_store.db_path}")
         print(f"Cropped image saved to {cropped_image_path}")
 
         # Clear the rotating rectangle after saving
@@ -229,20 +402,3 @@ class ImageView(tk.Frame):
         nx = cos_val * (x - cx) - sin_val * (y - cy) + cx
         ny = sin_val * (x - cx) + cos_val * (y - cy) + cy
         return nx, ny
-
-    def update_model_info_json(self, model_info, json_path):
-        try:
-            with open(json_path, "r") as json_file:
-                data = json.load(json_file)
-        except (FileNotFoundError, json.JSONDecodeError):
-            data = []
-
-        for model in data:
-            if model.get('name') == model_info['name']:
-                model.update(model_info)
-                break
-        else:
-            data.append(model_info)
-
-        with open(json_path, "w") as json_file:
-            json.dump(data, json_file, indent=4)
\ No newline at end of file
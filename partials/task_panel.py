@@ -2,11 +2,18 @@
 import os
 import tkinter as tk
 from tkinter import PhotoImage, messagebox
-import json
-from PIL import Image, ImageTk
+from helper.icon_cache import icon_cache
 from helper.language import language
-import cv2  # Add this import
-import numpy as np  # Add this import
+from helper.background_executor import BackgroundExecutor
+from helper.model_store import model_store
+from helper.startup_profile import startup_profiler
+
+
+def load_model_icons(image_paths, progress):
+    """ Runs on the icon worker; reports (button index, cached icon file or None) for each model. """
+    for index, image_path in enumerate(image_paths):
+        progress((index, icon_cache.icon_path(image_path)))
+    icon_cache.save_index()
 
 
 class TaskPanel(tk.Frame):
@@ -22,6 +29,10 @@ class TaskPanel(tk.Frame):
         self.active_button = None
         self.single_click_delay = 300  # milliseconds
         self.click_timer = None
+        self.model_buttons = []
+        # Model icons are read on a worker; a refresh supersedes the icons still being loaded
+        self.icon_executor = BackgroundExecutor(self, name="icon-loader")
+        self.bind("<Destroy>", lambda event: self.icon_executor.shutdown() if event.widget is self else None)
 
         self.create_widgets()
         self.load_models()
@@ -40,29 +51,29 @@ class TaskPanel(tk.Frame):
         self.add_model_button.pack(fill='x', pady=(10, 0))
 
     def load_models(self):
-        json_path = "model_info.json"
+        # Buttons come up at once with the placeholder icon; the real icons follow from the worker
+        with startup_profiler.phase("read model store"):
+            models = model_store.all()
+        self.model_buttons = [self.add_model_button_widget(model_info) for model_info in models]
+        self.icon_executor.submit(load_model_icons, [model_info.get('image_path', '') for model_info in models],
+                                  on_progress=self.set_model_icon,
+                                  on_done=lambda _: startup_profiler.mark(f"{len(models)} model icons loaded"))
+
+    def set_model_icon(self, loaded):
+        index, icon_path = loaded
+        if icon_path is None:
+            return  # Keep the placeholder
+        button = self.model_buttons[index]
         try:
-            with open(json_path, "r") as json_file:
-                data = json.load(json_file)
-                for model_info in data:
-                    self.add_model_button_widget(model_info)
-        except FileNotFoundError:
-            print(f"{json_path} not found.")
-        except json.JSONDecodeError:
-            print(f"Error decoding JSON from {json_path}.")
+            image = PhotoImage(file=icon_path)
+            button.config(image=image)
+        except tk.TclError:
+            return  # Button destroyed meanwhile, or the cached icon is unreadable
+        button.image = image
 
     def add_model_button_widget(self, model_info):
         model_name = model_info.get('name', 'Unnamed Model')
-        image_path = model_info.get('image_path', '')
-
-        try:
-            # Load and resize the image using PIL
-            image = Image.open(image_path)
-            image = image.resize((30, 30), Image.ANTIALIAS)  # Resize the image to fit the button size
-            image = ImageTk.PhotoImage(image)
-        except Exception as e:
-            print(f"Error loading image {image_path}: {e}")
-            image = self.icons['test']  # Default to a placeholder icon if image loading fails
+        image = self.icons['test']  # Placeholder until the model icon is loaded
 
         model_button = tk.Button(self, text=model_name, bg="gray", fg="white", height=2, padx=20, pady=30,
                                  compound="left", image=image, borderwidth=0, highlightthickness=0,
@@ -70,6 +81,7 @@ class TaskPanel(tk.Frame):
         model_button.image = image  # Keep a reference to the image to prevent garbage collection
         model_button.bind("<Double-Button-1>", lambda event: self.on_model_button_double_click(event, model_info, model_button))
         model_button.pack(fill='x', pady=(10, 0))
+        return model_button
 
     def on_model_button_click(self, model_info, button):
         if self.click_timer:
@@ -106,20 +118,9 @@ class TaskPanel(tk.Frame):
 
     def delete_model(self, model_info):
         print(f"Deleting model '{model_info['name']}'")
-        json_path = "model_info.json"
-        try:
-            with open(json_path, "r") as json_file:
-                data = json.load(json_file)
-            data = [model for model in data if model.get('name') != model_info.get('name')]
-            with open(json_path, "w") as json_file:
-                json.dump(data, json_file, indent=4)
-            self.refresh_model_list()  # Refresh the model list
-            self.clear_view()
-
-        except FileNotFoundError:
-            print(f"{json_path} not found.")
-        except json.JSONDecodeError:
-            print(f"Error decoding JSON from {json_path}.")
+        model_store.delete(model_info.get('name'))
+        self.refresh_model_list()  # Refresh the model list
+        self.clear_view()
 
     def clear_view(self):
         self.properties_panel.show_empty_properties()
@@ -134,6 +135,12 @@ class TaskPanel(tk.Frame):
         self.load_models()
 
     def display_image_in_view(self, model_info):
+        # OpenCV is imported on first use, not when the panel is built
+        import cv2
+        import numpy as np
+        from PIL import Image
+        from helper.template_matching import rotated_box_points
+
         try:
             # Clear existing thumbnails
             self.image_view.clear_thumbnails()
@@ -141,63 +148,65 @@ class TaskPanel(tk.Frame):
             # Display the primary image
             image_path = model_info.get('image_path', '')
             primary_img = Image.open(image_path)
-            primary_img_full = primary_img.copy()
-            primary_img_full_tk = ImageTk.PhotoImage(primary_img_full)
-            self.image_view.add_thumbnail(primary_img_full)
-            self.image_view.shared_image.set_image(primary_img_full_tk)
-            self.image_view.current_image = primary_img
-            self.image_view.zoom_factor = 1.0
-            self.image_view.center_image_on_canvas(primary_img_full_tk)
-            self.image_view.update_image()
+            # The file on disk backs the thumbnail, no second copy is kept in memory
+            self.image_view.add_thumbnail(image_path)
+            self.image_view.show_image(primary_img)
 
             # Calculate and display match percentages for additional images
             if 'additional_images' in model_info:
+                annotated = []
                 for additional_image_path in model_info['additional_images']:
                     additional_img = Image.open(additional_image_path)
-                    match_percentage, top_left, bottom_right, angle = self.calculate_match_percentage(primary_img,
-                                                                                                      additional_img)
+                    detections = self.detect_instances(primary_img, additional_img, model_info)
                     # Draw contour and text on additional image
                     additional_img_cv = cv2.cvtColor(np.array(additional_img), cv2.COLOR_RGB2BGR)
-                    cv2.putText(additional_img_cv, f'{match_percentage:.2f}%', (top_left[0], top_left[1] - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2, cv2.LINE_AA)
-                    cv2.rectangle(additional_img_cv, top_left, bottom_right, (0, 255, 0), 2)
-
-                    # Rotate the image around the center
-                    center = (top_left[0] + bottom_right[0]) // 2, (top_left[1] + bottom_right[1]) // 2
-                    M = cv2.getRotationMatrix2D(center, angle, 1.0)
-                    additional_img_cv = cv2.warpAffine(additional_img_cv, M,
-                                                       (additional_img_cv.shape[1], additional_img_cv.shape[0]))
+                    for i, (match_percentage, top_left, bottom_right, angle) in enumerate(detections):
+                        label = f'#{i + 1} {match_percentage:.2f}%' if len(detections) > 1 else f'{match_percentage:.2f}%'
+                        cv2.putText(additional_img_cv, label, (top_left[0], top_left[1] - 10),
+                                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2, cv2.LINE_AA)
+                        # Outline the model footprint at the angle it was found
+                        box = rotated_box_points(top_left, bottom_right, primary_img.size, angle)
+                        cv2.polylines(additional_img_cv, [box], True, (0, 255, 0), 2)
 
-                    additional_img = Image.fromarray(cv2.cvtColor(additional_img_cv, cv2.COLOR_BGR2RGB))
+                    annotated.append(Image.fromarray(cv2.cvtColor(additional_img_cv, cv2.COLOR_BGR2RGB)))
 
-                    self.image_view.add_thumbnail(additional_img)
+                # One strip redraw for the lot rather than one per image
+                self.image_view.add_thumbnails(annotated)
 
         except Exception as e:
             print(f"Error loading image {image_path}: {e}")
 
-    def calculate_match_percentage(self, primary_img, additional_img):
-        primary_img_cv = cv2.cvtColor(np.array(primary_img), cv2.COLOR_RGB2GRAY)
-        additional_img_cv = cv2.cvtColor(np.array(additional_img), cv2.COLOR_RGB2GRAY)
+    def rotated_templates_for(self, primary_img, model_info):
+        from helper.template_matching import model_templates
+        return model_templates(primary_img, model_info)
 
-        result = cv2.matchTemplate(additional_img_cv, primary_img_cv, cv2.TM_CCOEFF_NORMED)
-        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    def calculate_match_percentage(self, primary_img, additional_img, model_info=None):
+        # The work is Tk-free in template_matching so benchmark.py measures the same code
+        from helper.template_matching import calculate_match_percentage
+        return calculate_match_percentage(primary_img, additional_img, model_info)
 
-        # Calculate the bounding box coordinates
-        h, w = primary_img_cv.shape
-        top_left = max_loc
-        bottom_right = (top_left[0] + w, top_left[1] + h)
+    def detect_instances(self, primary_img, additional_img, model_info=None):
+        """ Up to detection_count matches above the model's matching %, sorted by its detection_order. """
+        from helper.template_matching import model_detection_settings, sort_detections, to_gray
 
-        # Calculate the angle (if any)
-        angle = 0  # No angle calculation here, but you can add your own logic
-
-        return max_val * 100, top_left, bottom_right, angle  # Convert to percentage
+        count, order, threshold = model_detection_settings(model_info)
+        templates = self.rotated_templates_for(primary_img, model_info)
+        if count == 1 and threshold is None:
+            # Nothing configured: always show the best match, like a single template match did
+            detections = [templates.search(to_gray(additional_img))]
+        else:
+            detections = templates.search_all(to_gray(additional_img), count, threshold)
+        return [(score * 100, top_left, (top_left[0] + w, top_left[1] + h), angle)
+                for score, top_left, (w, h), angle in sort_detections(detections, order)]
 
     def show_match_percentages(self, match_percentages):
         for image_path, percentage in match_percentages:
             print(f"{os.path.basename(image_path)}: {percentage:.2f}%")
 
     def add_new_model_to_task_panel(self, model_info):
-        self.add_model_button_widget(model_info)
+        self.model_buttons.append(self.add_model_button_widget(model_info))
+        # A single icon is cheap enough to load right here, and must not cancel the startup icon job
+        self.set_model_icon((len(self.model_buttons) - 1, icon_cache.icon_path(model_info.get('image_path', ''))))
 
     def on_button_click(self, button, command):
         # Only change color for Add New Model button
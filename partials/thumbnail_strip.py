@@ -0,0 +1,182 @@
+import tkinter as tk
+
+from helper.lru_cache import LRUCache
+from helper.background_executor import BackgroundExecutor
+from helper.thumbnail_cache import THUMBNAIL_WIDTH, thumbnail_cache
+
+SLOT_WIDTH = THUMBNAIL_WIDTH + 14  # thumbnail plus border and gap
+STRIP_HEIGHT = 100
+# Thumbnail PhotoImages kept around for scrolling back; the entries themselves are only ImageRefs
+PHOTO_CACHE_SIZE = 200
+
+
+def load_thumbnails(refs, progress):
+    """ Runs on the thumbnail worker; reports (ref, thumbnail or None) for each entry scrolled into view. """
+    for ref in refs:
+        progress((ref, thumbnail_cache.thumbnail(ref)))
+
+
+class ThumbnailStrip:
+    """
+    Horizontal thumbnail strip drawn straight onto a canvas. Entries are only ImageRefs; canvas
+    items exist for the visible slots alone and are moved and re-pointed as the strip scrolls,
+    so thousands of entries cost no more widgets than a screenful. Thumbnails are decoded on a
+    worker and appear as they arrive; until then a slot shows only its border.
+    """
+
+    def __init__(self, parent, on_select):
+        self.on_select = on_select
+        self.entries = []  # ImageRef per thumbnail, in strip order
+        self.selected_index = None
+        self.photos = LRUCache(PHOTO_CACHE_SIZE)
+        self.slots = []  # every (image item, border item) pair ever created
+        self.free_slots = []  # hidden pairs waiting to be reused
+        self.slot_photos = {}  # image item -> PhotoImage it shows, so LRU eviction cannot blank it
+        self.shown = {}  # entry index -> slot currently drawing it
+        self.failed = set()  # ids of refs whose thumbnail could not be made, not retried while scrolling
+        self.requested = ()
+
+        self.frame = tk.Frame(parent, bg='white')
+        self.scrollbar = tk.Scrollbar(self.frame, orient=tk.HORIZONTAL)
+        self.scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+
+        self.canvas = tk.Canvas(self.frame, bg='white', height=STRIP_HEIGHT, xscrollcommand=self.on_scrolled)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.config(command=self.canvas.xview)
+
+        self.canvas.bind("<Configure>", lambda e: self.render())
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-4>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-5>", self.on_mouse_wheel)
+
+        # A scroll supersedes the thumbnails still being decoded for the previous position
+        self.loader = BackgroundExecutor(self.canvas, name="thumbnail-loader")
+        self.frame.bind("<Destroy>", lambda event: self.loader.shutdown() if event.widget is self.frame else None)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def add(self, image):
+        """ image is a PIL image or a file path; returns the entry index. """
+        # An in-memory image stays readable from the cache until it is on disk, so its thumbnail can follow later
+        self.entries.append(thumbnail_cache.register(image))
+        self.update_scrollregion()
+        self.render()
+        return len(self.entries) - 1
+
+    def extend(self, images):
+        """ Adds many entries with a single redraw, e.g. a whole capture folder. """
+        for image in images:
+            self.entries.append(thumbnail_cache.register(image))
+        self.update_scrollregion()
+        self.render()
+
+    def clear(self):
+        self.loader.cancel_all()
+        self.requested = ()
+        self.entries = []
+        self.selected_index = None
+        self.photos.clear()
+        self.failed = set()
+        for slot in self.shown.values():
+            self.release_slot(slot)
+        self.shown = {}
+        self.update_scrollregion()
+        self.canvas.xview_moveto(0)
+
+    def update_scrollregion(self):
+        self.canvas.configure(scrollregion=(0, 0, max(1, len(self.entries) * SLOT_WIDTH), STRIP_HEIGHT))
+
+    def visible_range(self):
+        left = self.canvas.canvasx(0)
+        width = max(1, self.canvas.winfo_width())
+        first = max(0, int(left // SLOT_WIDTH))
+        last = min(len(self.entries) - 1, int((left + width) // SLOT_WIDTH))
+        return range(first, last + 1)
+
+    def photo_for(self, index):
+        """ The thumbnail if it has been decoded already; never decodes on the Tk thread. """
+        return self.photos.get(id(self.entries[index]))
+
+    def render(self):
+        visible = set(self.visible_range())
+
+        # Return the slots that scrolled out of view to the pool
+        for index in [index for index in self.shown if index not in visible]:
+            self.release_slot(self.shown.pop(index))
+        for index in sorted(visible - set(self.shown)):
+            if self.free_slots:
+                slot = self.free_slots.pop()
+            else:
+                slot = (self.canvas.create_image(0, 0, anchor='nw'),
+                        self.canvas.create_rectangle(0, 0, 0, 0, width=2))
+                self.slots.append(slot)
+            self.draw_slot(slot, index)
+            self.shown[index] = slot
+        self.request_thumbnails(sorted(visible))
+
+    def release_slot(self, slot):
+        image_item, border_item = slot
+        self.slot_photos.pop(image_item, None)
+        self.canvas.itemconfigure(image_item, image='', state='hidden')
+        self.canvas.itemconfigure(border_item, state='hidden')
+        self.free_slots.append(slot)
+
+    def request_thumbnails(self, indices):
+        refs = [self.entries[index] for index in indices
+                if id(self.entries[index]) not in self.photos and id(self.entries[index]) not in self.failed]
+        requested = tuple(id(ref) for ref in refs)
+        if not refs or (requested == self.requested and self.loader.is_busy()):
+            return  # Nothing missing, or the same thumbnails are already being decoded
+        self.requested = requested
+        self.loader.submit(load_thumbnails, refs, on_progress=self.on_thumbnail_loaded)
+
+    def on_thumbnail_loaded(self, loaded):
+        ref, thumb = loaded
+        if thumb is None:
+            self.failed.add(id(ref))
+            return
+        from PIL import ImageTk
+        self.photos.put(id(ref), ImageTk.PhotoImage(thumb))
+        for index, slot in self.shown.items():
+            if self.entries[index] is ref:
+                self.draw_slot(slot, index)
+
+    def draw_slot(self, slot, index):
+        image_item, border_item = slot
+        photo = self.photo_for(index)
+        x = index * SLOT_WIDTH + 7
+        y = 5
+        self.slot_photos[image_item] = photo
+        if photo is None:
+            self.canvas.itemconfigure(image_item, image='', state='hidden')
+            h = THUMBNAIL_WIDTH
+        else:
+            self.canvas.coords(image_item, x, y)
+            self.canvas.itemconfigure(image_item, image=photo, state='normal')
+            h = photo.height()
+        self.canvas.coords(border_item, x - 2, y - 2, x + THUMBNAIL_WIDTH + 1, y + h + 1)
+        outline = 'green' if index == self.selected_index else 'black'
+        self.canvas.itemconfigure(border_item, outline=outline, state='normal')
+
+    def select(self, index):
+        previous, self.selected_index = self.selected_index, index
+        for i in (previous, index):
+            if i in self.shown:
+                self.draw_slot(self.shown[i], i)
+
+    def on_scrolled(self, first, last):
+        self.scrollbar.set(first, last)
+        self.render()
+
+    def on_click(self, event):
+        index = int(self.canvas.canvasx(event.x) // SLOT_WIDTH)
+        if 0 <= index < len(self.entries):
+            self.on_select(index, self.entries[index])
+
+    def on_mouse_wheel(self, event):
+        if getattr(event, 'num', None) == 5 or getattr(event, 'delta', 0) < 0:
+            self.canvas.xview_scroll(1, 'units')
+        else:
+            self.canvas.xview_scroll(-1, 'units')
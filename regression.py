@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmark import DEFAULT_FRAME_PATTERNS, collect_frames, frames_for_model, git_revision
+from helper.instrumentation import instrumentation
+from helper.model_store import model_store
+from helper.object_matching import find_and_match_object, load_binary_image
+from helper.template_matching import calculate_match_percentage
+
+GOLDEN_PATH = "regression/golden.json"
+
+# How far a new run may drift from the golden result and still pass
+DEFAULT_TOLERANCES = {
+    'box_px': 2,  # every box corner and center, in pixels
+    'score': 0.5,  # SSIM / match percentage points
+    'angle': 0.5,  # degrees
+    'count_10_percent': 0,
+}
+
+# Budgets recorded by `record` are the measured p95 times this, so normal jitter passes
+DEFAULT_BUDGET_HEADROOM = 1.5
+# ...but never less than this above it, or sub-millisecond stages would fail on scheduler noise
+MIN_BUDGET_SLACK_MS = 1.0
+
+
+def run_case(model, frame_path):
+    """ Detections of both matchers for one (model, frame) and the stage timings of the run. """
+    detections = {}
+    with instrumentation.cycle("regression") as trace:
+        # A matcher that raises is recorded too, so a fix or a new failure both show up as a change
+        try:
+            binary = load_binary_image(frame_path)
+            with instrumentation.stage("find_and_match_object"):
+                boxes, scores, centers, _, count_10_percent = find_and_match_object(model['image_path'], binary)
+            detections['find_and_match_object'] = {
+                'boxes': [[int(v) for v in box] for box in boxes],
+                'centers': [[int(v) for v in center] for center in centers],
+                'scores': [round(float(score), 4) for score in scores],
+                'count_10_percent': int(count_10_percent),
+            }
+        except Exception as e:
+            detections['find_and_match_object'] = {'error': f"{type(e).__name__}: {e}"}
+
+        try:
+            # Decoded up front, as benchmark.py does, so the stage budget does not include PNG decoding
+            primary_img = Image.open(model['image_path'])
+            primary_img.load()
+            additional_img = Image.open(frame_path)
+            additional_img.load()
+            with instrumentation.stage("calculate_match_percentage"):
+                percent, top_left, bottom_right, angle = calculate_match_percentage(primary_img, additional_img,
+                                                                                    model)
+            detections['calculate_match_percentage'] = {
+                'percent': round(float(percent), 4),
+                'top_left': [int(v) for v in top_left],
+                'bottom_right': [int(v) for v in bottom_right],
+                'angle': round(float(angle), 4),
+            }
+        except Exception as e:
+            detections['calculate_match_percentage'] = {'error': f"{type(e).__name__}: {e}"}
+
+    return detections, dict(trace.stages, total=trace.total_ms)
+
+
+def compare_errors(name, golden, current):
+    """ Problems when only one side failed; None when both ran, so the values get compared. """
+    if 'error' not in golden and 'error' not in current:
+        return None
+    if 'error' in golden and 'error' in current:
+        return []
+    if 'error' in current:
+        return [f"{name} now fails: {current['error'].splitlines()[0]}"]
+    return [f"{name} now runs, golden failed: {golden['error'].splitlines()[0]}"]
+
+
+def run_corpus(pairs, repeat=3, warmup=1):
+    """ {(model name, frame): detections} from the first timed run, and every stage time of every run. """
+    results = {}
+    timings = {}
+    for model, frame in pairs:
+        for _ in range(warmup):
+            run_case(model, frame)  # Fills the reference and template caches
+        for run in range(max(1, repeat)):
+            detections, stages = run_case(model, frame)
+            if run == 0:
+                results[(model['name'], frame)] = detections
+            for stage, ms in stages.items():
+                timings.setdefault(stage, []).append(ms)
+    return results, timings
+
+
+def p95(values):
+    return float(np.percentile(values, 95))
+
+
+def match_detections(golden, current, tolerances):
+    """ Problems found between two find_and_match_object results, empty when they agree. """
+    errors = compare_errors("find_and_match_object", golden, current)
+    if errors is not None:
+        return errors
+    problems = []
+    if len(golden['boxes']) != len(current['boxes']):
+        problems.append(f"{len(current['boxes'])} detections, golden has {len(golden['boxes'])}")
+    if abs(golden['count_10_percent'] - current['count_10_percent']) > tolerances['count_10_percent']:
+        problems.append(f"count_10_percent {current['count_10_percent']}, golden {golden['count_10_percent']}")
+
+    # Pair each golden detection with the nearest unused new one; order may legitimately change
+    unused = list(range(len(current['centers'])))
+    for i, center in enumerate(golden['centers']):
+        if not unused:
+            break
+        j = min(unused, key=lambda k: np.hypot(current['centers'][k][0] - center[0],
+                                               current['centers'][k][1] - center[1]))
+        unused.remove(j)
+        box_drift = max(abs(a - b) for a, b in zip(golden['boxes'][i] + center,
+                                                   current['boxes'][j] + current['centers'][j]))
+        if box_drift > tolerances['box_px']:
+            problems.append(f"detection #{i + 1} moved {box_drift} px: {golden['boxes'][i]} -> {current['boxes'][j]}")
+        score_drift = abs(golden['scores'][i] - current['scores'][j])
+        if score_drift > tolerances['score']:
+            problems.append(f"detection #{i + 1} score {current['scores'][j]:.2f}, golden {golden['scores'][i]:.2f}")
+    return problems
+
+
+def match_percentage(golden, current, tolerances):
+    errors = compare_errors("calculate_match_percentage", golden, current)
+    if errors is not None:
+        return errors
+    problems = []
+    if abs(golden['percent'] - current['percent']) > tolerances['score']:
+        problems.append(f"match {current['percent']:.2f}%, golden {golden['percent']:.2f}%")
+    drift = max(abs(a - b) for a, b in zip(golden['top_left'] + golden['bottom_right'],
+                                           current['top_left'] + current['bottom_right']))
+    if drift > tolerances['box_px']:
+        problems.append(f"match box moved {drift} px: {golden['top_left']} -> {current['top_left']}")
+    if abs(golden['angle'] - current['angle']) > tolerances['angle']:
+        problems.append(f"match angle {current['angle']:.1f}, golden {golden['angle']:.1f}")
+    return problems
+
+
+def record(models, frames, golden_path, repeat, warmup, headroom):
+    pairs = [(model, frame) for model in models for frame in frames_for_model(model, frames)]
+    results, timings = run_corpus(pairs, repeat, warmup)
+    golden = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'revision': git_revision(),
+        'tolerances': DEFAULT_TOLERANCES,
+        # p95 milliseconds per stage; edit by hand to tighten or loosen a budget
+        'budgets_ms': {stage: round(max(p95(values) * headroom, p95(values) + MIN_BUDGET_SLACK_MS), 2)
+                       for stage, values in timings.items()},
+        'cases': [{'model': model_name, 'frame': frame, **detections}
+                  for (model_name, frame), detections in results.items()],
+    }
+    os.makedirs(os.path.dirname(golden_path) or ".", exist_ok=True)
+    tmp_path = f"{golden_path}.tmp"
+    with open(tmp_path, "w") as golden_file:
+        json.dump(golden, golden_file, indent=4)
+    os.replace(tmp_path, golden_path)
+    print(f"Recorded {len(results)} cases and {len(golden['budgets_ms'])} stage budgets to {golden_path}")
+    return 0
+
+
+def check(models, frames, golden_path, repeat, warmup, only_models=None):
+    with open(golden_path, "r") as golden_file:
+        golden = json.load(golden_file)
+    tolerances = dict(DEFAULT_TOLERANCES, **golden.get('tolerances', {}))
+
+    # Exactly the recorded (model, frame) pairs are re-run; cases whose model or frame is gone fail
+    models_by_name = {model['name']: model for model in models}
+    frames = set(frames)
+    cases = [case for case in golden['cases'] if not only_models or case['model'] in only_models]
+    pairs = [(models_by_name[case['model']], case['frame']) for case in cases
+             if case['model'] in models_by_name and case['frame'] in frames]
+    results, timings = run_corpus(pairs, repeat, warmup)
+
+    failures = 0
+    for case in cases:
+        current = results.get((case['model'], case['frame']))
+        if current is None:
+            problems = ["not run (model or frame missing)"]
+        else:
+            problems = (match_detections(case['find_and_match_object'], current['find_and_match_object'], tolerances)
+                        + match_percentage(case['calculate_match_percentage'],
+                                           current['calculate_match_percentage'], tolerances))
+        if problems:
+            failures += 1
+            print(f"FAIL {case['model']} {case['frame']}: " + "; ".join(problems))
+    print(f"Detections: {len(cases) - failures}/{len(cases)} cases match the golden results")
+
+    over_budget = 0
+    for stage, budget in golden.get('budgets_ms', {}).items():
+        if stage not in timings:
+            continue
+        measured = p95(timings[stage])
+        status = "ok" if measured <= budget else "OVER"
+        if measured > budget:
+            over_budget += 1
+        print(f"{status:>4} {stage:<28} p95 {measured:9.2f} ms  budget {budget:9.2f} ms")
+
+    return 1 if failures or over_budget else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Record golden detections, or check a run against them.")
+    parser.add_argument("command", choices=("record", "check"))
+    parser.add_argument("--golden", default=GOLDEN_PATH, help="golden results file")
+    parser.add_argument("--models", nargs="+", help="model names (default: every model in the store)")
+    parser.add_argument("--frames", nargs="+", default=DEFAULT_FRAME_PATTERNS, help="frame glob patterns")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case for the latency budgets")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per case before timing")
+    parser.add_argument("--headroom", type=float, default=DEFAULT_BUDGET_HEADROOM,
+                        help="record: budget = measured p95 x headroom")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    models = model_store.all()
+    if args.models:
+        models = [model for model in models if model['name'] in args.models]
+    models = [model for model in models if os.path.isfile(model.get('image_path', ''))]
+    frames = collect_frames(args.frames, [model['image_path'] for model in model_store.all()])
+    if not models or not frames:
+        print("Nothing to run: no models with an image or no frames found.", file=sys.stderr)
+        return 2
+
+    if args.command == "record":
+        return record(models, frames, args.golden, args.repeat, args.warmup, args.headroom)
+    return check(models, frames, args.golden, args.repeat, args.warmup, args.models)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
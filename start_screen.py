@@ -1,7 +1,10 @@
+import argparse
 import tkinter as tk
-from PIL import Image, ImageTk
+from helper.camera import camera_manager
+from helper.icon_cache import icon_cache
+from helper.instrumentation import log_to_file
 from helper.shared_state import SharedImage
-from home_page import HomeScreen
+from helper.startup_profile import startup_profiler
 
 class StartScreen:
     def __init__(self, root):
@@ -14,13 +17,10 @@ class StartScreen:
         # Bind the escape key to toggle fullscreen
         self.root.bind('<Escape>', self.toggle_fullscreen)  # Toggle fullscreen mode on pressing the Escape key
 
-        # Load and resize the logo image
-        self.original_logo_image = Image.open('images/logo.png')  # Load the logo image
-        self.resized_logo_image = self.original_logo_image.resize(
-            (int(self.original_logo_image.width * 1.5), int(self.original_logo_image.height * 1.5)),
-            Image.LANCZOS  # Resize the image using Lanczos resampling
-        )
-        self.logo_image = ImageTk.PhotoImage(self.resized_logo_image)  # Convert the resized image to a format Tkinter can use
+        # Load the logo scaled by 1.5; the scaled copy is baked once into the icon cache
+        logo_path = icon_cache.icon_path('images/logo.png', scale=1.5)
+        icon_cache.save_index()
+        self.logo_image = tk.PhotoImage(file=logo_path) if logo_path else None
 
         # Create a frame to hold the logo and the button
         self.frame = tk.Frame(self.root, bg="white")  # Create a frame to hold the logo and the button
@@ -36,6 +36,9 @@ class StartScreen:
         # Bind the window deiconify event to center the window
         self.root.bind('<Map>', self.on_map)  # Center the window when it is deiconified
 
+        # Import the home screen while the operator looks at the start page, not before it shows
+        self.root.after(100, self.preload_home_screen)
+
     def toggle_fullscreen(self, event=None):
         # Toggle the fullscreen state of the window
         if self.root.attributes('-fullscreen'):
@@ -76,13 +79,36 @@ class StartScreen:
         )
         self.start_button.pack()  # Pack the button
 
+    def preload_home_screen(self):
+        with startup_profiler.phase("import home screen"):
+            import home_page  # noqa: F401
+        startup_profiler.mark("home screen ready to start")
+
     def start_action(self):
+        from home_page import HomeScreen
+
         # Destroy the start screen frame and initialize the HomeScreen
         self.frame.destroy()
         HomeScreen(self.root, self.shared_image)  # Pass the shared image object to HomeScreen
 
 
 if __name__ == '__main__':
-    root = tk.Tk()
-    app = StartScreen(root)
+    parser = argparse.ArgumentParser(description="Show the start page of the inspection station.")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print import and phase timings to stderr once the window is usable")
+    args = parser.parse_args()
+    if args.profile_startup:
+        startup_profiler.enable()
+    log_to_file()  # Per-stage matching timings, one JSON line per cycle
+
+    with startup_profiler.phase("create window"):
+        root = tk.Tk()
+    with startup_profiler.phase("build start screen"):
+        app = StartScreen(root)
+    if args.profile_startup:
+        with startup_profiler.phase("first paint"):
+            root.update()
+        startup_profiler.report()
     root.mainloop()
+    # Cameras are kept open between captures, close them however the window was closed
+    camera_manager.release_all()